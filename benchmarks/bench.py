@@ -0,0 +1,208 @@
+"""
+Benchmarks for building, serializing and rendering flowgiston charts at scale.
+
+Times (best of --repeat runs) and peak traced memory are recorded for each phase of each synthetic chart:
+
+    build       creating the chart's nodes and edges
+    source      generating the DOT source string
+    save        streaming the DOT source to a file
+    render      rendering with each --engine and --format through the chosen --backend (charts up to
+                --max-render-nodes only)
+
+plus the primitives ``nodes`` (creating n nodes) and ``edges`` (creating n edges between existing nodes).
+
+Examples:
+
+    python benchmarks/bench.py --sizes 1000 10000 100000
+    python benchmarks/bench.py --save-baseline
+    python benchmarks/bench.py --compare benchmarks/baseline.json
+
+Comparing against a baseline exits with status 1 if any time regressed by more than --threshold.  Results record the
+render backend they were measured with (under ``_meta``): comparing renders the same way as the baseline, and refuses
+to run with a different --backend, as subprocess and in-process render times aren't comparable.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flowgiston import FlowgistonChart, SubprocessBackend, PygraphvizBackend
+from charts import GENERATORS
+
+BACKENDS = {'subprocess': SubprocessBackend, 'pygraphviz': PygraphvizBackend}
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def measure(func, repeat: int) -> tuple:
+    """
+    Runs ``func`` ``repeat`` times for the best wall time, then once more under tracemalloc for the peak memory.
+    Returns: A (seconds, peak MB, last result) tuple
+
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2 ** 20, result
+
+
+def bench_primitives(n: int, repeat: int) -> dict:
+    """
+    Times creating n nodes, and creating n edges between existing nodes.
+    """
+    results = {}
+
+    def nodes():
+        chart = FlowgistonChart()
+        for i in range(n):
+            chart.process('Node %d' % i)
+        return chart
+
+    results['nodes_s'], results['nodes_peak_mb'], _ = measure(nodes, repeat)
+
+    chart = FlowgistonChart()
+    handles = [chart.process('Node %d' % i) for i in range(n)]
+
+    def edges():
+        # appends to the same chart each run; only the time per call matters
+        for a, b in zip(handles, handles[1:] + handles[:1]):
+            a.edge(b)
+
+    results['edges_s'], results['edges_peak_mb'], _ = measure(edges, repeat)
+    return results
+
+
+def bench_case(name: str, n: int, repeat: int, backend: 'RenderBackend', engines: list, formats: list,
+               max_render_nodes: int) -> dict:
+    """
+    Times building, serializing, saving and rendering one synthetic chart.
+    """
+    generator = GENERATORS[name]
+    results = {}
+    results['build_s'], results['build_peak_mb'], chart = measure(lambda: generator(n), repeat)
+    results['source_s'], results['source_peak_mb'], source = measure(lambda: chart.source, repeat)
+    results['source_bytes'] = len(source.encode('utf-8'))
+    del source
+
+    with TemporaryDirectory() as td:
+        results['save_s'], results['save_peak_mb'], _ = measure(lambda: chart.save('bench.gv', td), repeat)
+
+        if n <= max_render_nodes:
+            chart.backend = backend
+            for engine in engines:
+                chart.graph.engine = engine
+                for format in formats:
+                    key = 'render_%s_%s' % (engine, format)
+                    try:
+                        results[key + '_s'], _, _ = measure(lambda: chart.render('bench.gv', td, format=format),
+                                                            repeat)
+                    except Exception as e:
+                        print('  %s/%d: %s failed: %s' % (name, n, key, e), file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Prints each timing against the baseline.
+    Returns: A list of the (case, metric, ratio) entries slower than ``threshold`` times the baseline
+
+    """
+    regressions = []
+    known_backend = '_meta' in baseline
+    if not known_backend:
+        print('baseline does not record its render backend: render timings are not compared', file=sys.stderr)
+    for case, metrics in sorted(results.items()):
+        if case == '_meta':
+            continue
+        for metric, value in sorted(metrics.items()):
+            old = baseline.get(case, {}).get(metric)
+            if old is None or not metric.endswith('_s') or old <= 0:
+                continue
+            if metric.startswith('render_') and not known_backend:
+                continue
+            ratio = value / old
+            flag = ''
+            if ratio > threshold:
+                flag = '  REGRESSION'
+                regressions.append((case, metric, ratio))
+            print('%-28s %-24s %10.4f %10.4f %7.2fx%s' % (case, metric, old, value, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--cases', nargs='+', default=sorted(GENERATORS), choices=sorted(GENERATORS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        help="render backend (default: the baseline's with --compare, otherwise subprocess)")
+    parser.add_argument('--engines', nargs='+', default=['dot'])
+    parser.add_argument('--formats', nargs='+', default=['svg'])
+    parser.add_argument('--max-render-nodes', type=int, default=1000,
+                        help='skip rendering charts larger than this (default: %(default)s)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against a baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to %s' % BASELINE)
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fd:
+            baseline = json.load(fd)
+        recorded = baseline.get('_meta', {}).get('backend')
+        if args.backend is None:
+            args.backend = recorded
+        elif recorded is not None and recorded != args.backend:
+            parser.error('%s was recorded with the %s backend, not %s' % (args.compare, recorded, args.backend))
+    if args.backend is None:
+        args.backend = 'subprocess'
+
+    backend = BACKENDS[args.backend]()
+    results = {'_meta': {'backend': args.backend, 'engines': args.engines, 'formats': args.formats}}
+    for n in args.sizes:
+        print('primitives/%d' % n, file=sys.stderr)
+        results['primitives/%d' % n] = bench_primitives(n, args.repeat)
+        for name in args.cases:
+            print('%s/%d' % (name, n), file=sys.stderr)
+            results['%s/%d' % (name, n)] = bench_case(name, n, args.repeat, backend, args.engines,
+                                                      args.formats, args.max_render_nodes)
+
+    for path in filter(None, [args.output, BASELINE if args.save_baseline else None]):
+        with open(path, 'w') as fd:
+            json.dump(results, fd, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('%d regression(s) over %.2fx' % (len(regressions), args.threshold))
+            return 1
+    else:
+        for case, metrics in sorted(results.items()):
+            if case == '_meta':
+                continue
+            for metric, value in sorted(metrics.items()):
+                print('%-28s %-24s %12.4f' % (case, metric, value))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
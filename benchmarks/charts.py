@@ -0,0 +1,82 @@
+"""
+Synthetic chart generators for the benchmarks.  Each generator builds a chart of roughly ``n`` nodes through the
+regular per-node API, so building one exercises node generation, style merging and edge creation.
+"""
+from flowgiston import FlowgistonChart, flowgiston_base
+
+
+def linear_chain(n: int, **chart_kwargs) -> FlowgistonChart:
+    """
+    A single chain of process nodes: start -> 1 -> 2 -> ... -> end
+    """
+    chart = FlowgistonChart(**chart_kwargs)
+    node = chart.start('Start')
+    for i in range(n - 2):
+        node = node.edge(chart.process('Step %d' % i))
+    node.edge(chart.end('End'))
+    return chart
+
+
+def fan_out(n: int, **chart_kwargs) -> FlowgistonChart:
+    """
+    One hub node with an edge to each of the other nodes
+    """
+    chart = FlowgistonChart(**chart_kwargs)
+    hub = chart.process('Hub')
+    for i in range(n - 1):
+        hub.edge(chart.process('Leaf %d' % i), 'to %d' % i)
+    return chart
+
+
+def conditional_tree(n: int, **chart_kwargs) -> FlowgistonChart:
+    """
+    A complete binary tree of conditionals, each with a Yes and a No branch, with about ``n`` nodes
+    """
+    chart = FlowgistonChart(**chart_kwargs)
+    level = [chart.if_('Root?')]
+    count = 1
+    while count < n:
+        next_level = []
+        for node in level:
+            for branch in (node.yes, node.no):
+                if count >= n:
+                    break
+                next_level.append(branch(chart.if_('Check %d?' % count)))
+                count += 1
+        level = next_level
+    return chart
+
+
+def many_styles(n: int, classes: int = 20, **chart_kwargs) -> FlowgistonChart:
+    """
+    A chain of nodes drawn round-robin from ``classes`` styled FlowgistonBase subclasses
+    """
+    Base = flowgiston_base()
+    kinds = [type('Style%d' % i, (Base,), {'fillcolor': '/set312/%d' % (i % 12 + 1), 'shape': 'box',
+                                           'fontcolor': 'black'})
+             for i in range(classes)]
+    chart = FlowgistonChart(Base, **chart_kwargs)
+    styled = [getattr(chart, kind.__name__) for kind in kinds]
+    node = chart.start('Start')
+    for i in range(n - 1):
+        node = node.edge(styled[i % classes].node('Node %d' % i))
+    return chart
+
+
+def bulk_chain(n: int, **chart_kwargs) -> FlowgistonChart:
+    """
+    The same shape as linear_chain, built with the bulk add_nodes/add_edges API
+    """
+    chart = FlowgistonChart(**chart_kwargs)
+    ids = chart.add_nodes(['Step %d' % i for i in range(n)], styles={'shape': 'box'})
+    chart.add_edges(ids[:-1], ids[1:])
+    return chart
+
+
+GENERATORS = {
+    'linear_chain': linear_chain,
+    'fan_out': fan_out,
+    'conditional_tree': conditional_tree,
+    'many_styles': many_styles,
+    'bulk_chain': bulk_chain,
+}
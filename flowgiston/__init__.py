@@ -1 +1,22 @@
-from .base import *
+from .base import flowgiston_base, FlowgistonChart, FlowgistonNode
+from .cache import RenderCache
+from .batch import render_many, RenderResult
+from .backends import RenderBackend, SubprocessBackend, PygraphvizBackend
+from .instrument import Instrumentation
+from .template import SubflowTemplate, SubflowInstance
+from .overview import Overview
+from .spec import compile_spec, load_spec, compile_specs, SpecResult
+
+__all__ = [
+    'flowgiston_base', 'FlowgistonChart', 'FlowgistonNode', 'Digraph', 'RenderCache', 'render_many', 'RenderResult',
+    'RenderBackend', 'SubprocessBackend', 'PygraphvizBackend', 'Instrumentation', 'SubflowTemplate', 'SubflowInstance',
+    'Overview', 'compile_spec', 'load_spec', 'compile_specs', 'SpecResult',
+]
+
+
+def __getattr__(name):
+    # graphviz.Digraph is re-exported as before, but graphviz is only imported when it's asked for
+    if name == 'Digraph':
+        from graphviz import Digraph
+        return Digraph
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import subprocess
+import weakref
+
+from graphviz import backend
+
+_max_concurrency = os.cpu_count() or 1
+# one semaphore per event loop, since asyncio primitives can't be shared between loops
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_max_concurrency(limit: int) -> None:
+    """
+    Sets how many graphviz processes the asyncio API runs at once, across all charts.  Further renders wait for a
+    free slot.  Takes effect for event loops that haven't rendered anything yet.
+    Args:
+        limit: The maximum number of simultaneous graphviz processes
+
+    Returns: None
+
+    """
+    global _max_concurrency
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    _max_concurrency = limit
+    _semaphores.clear()
+
+
+def _semaphore() -> asyncio.Semaphore:
+    """
+    Returns the semaphore limiting graphviz processes on the running event loop.
+    Returns: asyncio.Semaphore
+
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(_max_concurrency)
+    return semaphore
+
+
+async def run(cmd: list, input: bytes = None, timeout: float = None) -> bytes:
+    """
+    Runs a graphviz command in an asyncio subprocess, the asyncio counterpart of graphviz.backend.run.  If the
+    timeout expires or the calling task is cancelled, the process is killed.
+    Args:
+        cmd: The command, e.g. from graphviz.backend.command
+        input: (Optional) bytes written to the process's stdin
+        timeout: (Optional) seconds to wait for the process to finish
+
+    Returns: The process's stdout
+
+    Raises:
+        graphviz.ExecutableNotFound: If the graphviz executable is not found
+        subprocess.CalledProcessError: If the exit status is non-zero
+        asyncio.TimeoutError: If the timeout expires
+
+    """
+    async with _semaphore():
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdin=subprocess.PIPE if input is not None else None,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise backend.ExecutableNotFound(cmd)
+
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(input), timeout)
+        except BaseException:
+            # timed out or cancelled: don't leave the layout running in the background
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output=out, stderr=err)
+    return out
@@ -0,0 +1,200 @@
+def _render_command(engine: str, formats: list, filepath: str, renderer=None, formatter=None) -> tuple:
+    """
+    Returns the graphviz command that renders a DOT file into several formats in a single run, so the layout is only
+    computed once, along with the paths it writes.
+    Args:
+        engine: The layout engine
+        formats: The output formats
+        filepath: Path of the DOT source
+        renderer: The output renderer, applied to every format
+        formatter: The output formatter, applied to every format
+
+    Returns: A (command, paths) tuple, with one path per format
+
+    """
+    from graphviz import backend
+    cmd = [engine]
+    rendered = []
+    for format in formats:
+        format_cmd, path = backend.command(engine, format, filepath, renderer, formatter)
+        cmd.append(format_cmd[1])
+        rendered.append(path)
+    cmd.extend(['-O', filepath])
+    return cmd, rendered
+
+
+class RenderBackend:
+    """
+    The interface FlowgistonChart uses to lay out and render charts.  Subclass this to plug in another way of running
+    graphviz, and pass an instance to FlowgistonChart.  Backends are stateless and can be shared between charts.
+    """
+
+    def pipe(self, chart: 'FlowgistonChart', format: str, renderer=None, formatter=None, data: bytes = None) -> bytes:
+        """
+        Renders a chart and returns the output.
+        Args:
+            chart: The FlowgistonChart to render
+            format: The output format
+            renderer: The output renderer
+            formatter: The output formatter
+            data: (Optional) the chart's encoded DOT source, if the caller already built it
+
+        Returns: The rendered output as bytes
+
+        """
+        raise NotImplementedError
+
+    def render(self, chart: 'FlowgistonChart', filepath: str, formats: list, renderer=None, formatter=None) -> list:
+        """
+        Renders a chart whose DOT source has been saved to ``filepath`` into one or more formats, writing each one
+        next to the source as graphviz does (``<filepath>.<format>``).
+        Args:
+            chart: The FlowgistonChart to render
+            filepath: Path of the saved DOT source
+            formats: The output formats
+            renderer: The output renderer
+            formatter: The output formatter
+
+        Returns: The paths of the rendered files, one per format
+
+        """
+        raise NotImplementedError
+
+    async def pipe_async(self, chart: 'FlowgistonChart', format: str, renderer=None, formatter=None,
+                         data: bytes = None, timeout: float = None) -> bytes:
+        """
+        The asyncio version of pipe.  By default runs pipe in the loop's default executor; on timeout or cancellation
+        the result is abandoned but the work itself can't be interrupted.
+        Returns: The rendered output as bytes
+
+        """
+        import asyncio
+        import functools
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.pipe, chart, format, renderer, formatter, data)
+        return await asyncio.wait_for(loop.run_in_executor(None, call), timeout)
+
+    async def render_async(self, chart: 'FlowgistonChart', filepath: str, formats: list, renderer=None,
+                           formatter=None, timeout: float = None) -> list:
+        """
+        The asyncio version of render.  By default runs render in the loop's default executor; on timeout or
+        cancellation the result is abandoned but the work itself can't be interrupted.
+        Returns: The paths of the rendered files, one per format
+
+        """
+        import asyncio
+        import functools
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.render, chart, filepath, formats, renderer, formatter)
+        return await asyncio.wait_for(loop.run_in_executor(None, call), timeout)
+
+
+class SubprocessBackend(RenderBackend):
+    """
+    Renders by running the graphviz command line tools (``dot``, ``neato``, ...) in a subprocess, the same as the
+    graphviz package.  This is the default backend.
+    """
+
+    def pipe(self, chart, format, renderer=None, formatter=None, data=None):
+        from graphviz import backend
+        if data is None:
+            data = chart.source.encode(chart.graph.encoding)
+        return backend.pipe(chart.graph.engine, format, data, renderer, formatter)
+
+    def render(self, chart, filepath, formats, renderer=None, formatter=None):
+        from graphviz import backend
+        cmd, rendered = _render_command(chart.graph.engine, formats, filepath, renderer, formatter)
+        backend.run(cmd, capture_output=True, check=True)
+        return rendered
+
+    async def pipe_async(self, chart, format, renderer=None, formatter=None, data=None, timeout=None):
+        from graphviz import backend
+        from . import aio
+        if data is None:
+            data = chart.source.encode(chart.graph.encoding)
+        cmd, _ = backend.command(chart.graph.engine, format, None, renderer, formatter)
+        return await aio.run(cmd, data, timeout)
+
+    async def render_async(self, chart, filepath, formats, renderer=None, formatter=None, timeout=None):
+        from . import aio
+        cmd, rendered = _render_command(chart.graph.engine, formats, filepath, renderer, formatter)
+        await aio.run(cmd, timeout=timeout)
+        return rendered
+
+
+class PygraphvizBackend(RenderBackend):
+    """
+    Renders in-process with the Graphviz libraries (cgraph and gvc), through pygraphviz.  The chart's nodes and edges
+    are handed to Graphviz directly, with no DOT text and no subprocess, which is much faster for small charts.
+
+    Requires pygraphviz.  Only the chart's nodes, edges and graph/node/edge attributes are rendered: DOT lines added
+    straight to ``chart.graph.body`` are ignored.
+    """
+
+    def __init__(self):
+        try:
+            import pygraphviz
+        except ImportError:
+            raise ImportError('PygraphvizBackend requires pygraphviz, see https://pygraphviz.github.io')
+        self._pygraphviz = pygraphviz
+
+    def agraph(self, chart: 'FlowgistonChart') -> 'pygraphviz.AGraph':
+        """
+        Builds a pygraphviz graph from a chart.
+        Args:
+            chart: A FlowgistonChart
+
+        Returns: pygraphviz.AGraph
+
+        """
+        chart._merge_buffers()
+        g = self._pygraphviz.AGraph(directed=True, strict=False)
+        g.graph_attr.update(chart.graph.graph_attr)
+        g.node_attr.update(chart.graph.node_attr)
+        g.edge_attr.update(chart.graph.edge_attr)
+
+        styles = chart._styles
+        names = chart._node_names
+        for name, label, style_id in zip(names, chart._node_labels, chart._node_styles):
+            attrs = dict(styles[style_id])
+            if label is not None:
+                attrs['label'] = label
+            g.add_node(name, **attrs)
+        if chart._positions:
+            for name, pos in chart._positions.items():
+                g.get_node(name).attr['pos'] = pos
+        for t, h, label, style_id in zip(chart._edge_tails, chart._edge_heads, chart._edge_labels,
+                                         chart._edge_styles):
+            attrs = dict(styles[style_id])
+            if label is not None:
+                attrs['label'] = label
+            # without a key, pygraphviz would merge parallel edges
+            g.add_edge(names[t], names[h], key=str(g.number_of_edges()), **attrs)
+        for number, (label, members) in enumerate(chart._clusters):
+            cluster = g.add_subgraph([names[index] for index in members], name='cluster_%d' % number)
+            if label is not None:
+                cluster.graph_attr['label'] = label
+        return g
+
+    @staticmethod
+    def _format(format, renderer=None, formatter=None) -> str:
+        return ':'.join(s for s in (format, renderer, formatter) if s is not None)
+
+    def pipe(self, chart, format, renderer=None, formatter=None, data=None):
+        g = self.agraph(chart)
+        return g.draw(format=self._format(format, renderer, formatter), prog=chart.graph.engine)
+
+    def render(self, chart, filepath, formats, renderer=None, formatter=None):
+        g = self.agraph(chart)
+        engine = chart.graph.engine
+        from graphviz import backend
+        rendered = [backend.command(engine, format, filepath, renderer, formatter)[1] for format in formats]
+        if len(formats) == 1:
+            g.draw(rendered[0], format=self._format(formats[0], renderer, formatter), prog=engine)
+            return rendered
+
+        # lay out once, then draw every format from the stored positions
+        g.layout(prog=engine)
+        for format, path in zip(formats, rendered):
+            g.draw(path, format=self._format(format, renderer, formatter))
+        return rendered
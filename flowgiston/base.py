@@ -1,5 +1,13 @@
-from uuid import uuid4
-from graphviz import Digraph
+import io
+import os
+import threading
+from array import array
+from contextlib import contextmanager, nullcontext
+from hashlib import blake2b
+from time import perf_counter
+from .backends import SubprocessBackend
+
+__all__ = ['flowgiston_base', 'FlowgistonChart', 'FlowgistonNode']
 
 
 def flowgiston_base(**base_style):
@@ -30,15 +38,25 @@ def flowgiston_base(**base_style):
                 fchart: A FlowgistonChart
             """
             self.fchart = fchart
+            self._base_style = self._class_style().copy()
 
-            # populate style features from the class
-            if base_style is None:
-                self._base_style = {}
-            else:
-                self._base_style = base_style.copy()
-            for a in self.__GV_NODE_ATTRIBS:
-                if hasattr(self, a):
-                    self._base_style[a] = getattr(self, a)
+        @classmethod
+        def _class_style(cls) -> dict:
+            """
+            Returns the style dict for this class: the base style updated with any graphviz node attributes set on
+            the class.  Computed once per class and cached on it, so changing a class's style attributes after
+            creating a chart has no effect.
+            Returns: dict
+
+            """
+            style = cls.__dict__.get('_class_style_cache')
+            if style is None:
+                style = {} if base_style is None else base_style.copy()
+                for a in cls.__GV_NODE_ATTRIBS:
+                    if hasattr(cls, a):
+                        style[a] = getattr(cls, a)
+                cls._class_style_cache = style
+            return style
 
         def _construct_style(self, **kwargs):
             """
@@ -53,13 +71,15 @@ def flowgiston_base(**base_style):
             style.update(kwargs)
             return style
 
-        def _name(self):
+        def _name(self, label: str = None):
             """
-            Returns a random name for this node.
+            Returns a name for a new node, using the chart's naming scheme.
+            Args:
+                label: The label of the new node
             Returns: str
 
             """
-            return 'n_' + uuid4().hex
+            return self.fchart._new_name(self, label)
 
         def _nodegen(self, label: str, **kwargs) -> 'FlowgistonNode':
             """
@@ -70,14 +90,28 @@ def flowgiston_base(**base_style):
             Returns: a new FlowgistonNode corresponding to this object
 
             """
-            name = self._name()
+            instrumentation = self.fchart.instrumentation
+            if instrumentation is not None:
+                start = perf_counter()
+
             if label is None:
                 label = kwargs.get('label', None)
             if label is None:
                 label = getattr(self, 'label', None)
+            name = self._name(label)
 
-            self.fchart.graph.node(name, label=label, **self._construct_style(**kwargs))
-            return FlowgistonNode(name, label, self)
+            if instrumentation is not None:
+                style_start = perf_counter()
+            style = self._construct_style(**kwargs)
+            style.pop('label', None)
+            if instrumentation is not None:
+                instrumentation.record('construct_style', perf_counter() - style_start, notify=False)
+
+            index = self.fchart._add_node(name, label, style, self)
+            node = FlowgistonNode(name, label, self, index)
+            if instrumentation is not None:
+                instrumentation.record('nodegen', perf_counter() - start, notify=False)
+            return node
 
         def conditional(self, label: str, **kwargs) -> 'FlowgistonNode':
             """
@@ -179,26 +213,559 @@ def flowgiston_base(**base_style):
     return FlowgistonBase
 
 
+def _as_list(values) -> list:
+    """
+    Converts a sequence, NumPy array or pandas Series to a list.
+    Returns: list
+
+    """
+    tolist = getattr(values, 'tolist', None)
+    return tolist() if tolist is not None else list(values)
+
+
+def _plain_positions(lines) -> dict:
+    """
+    Reads the node positions from graphviz 'plain' output.
+    Args:
+        lines: The lines of the output
+
+    Returns: A dict of node name -> (x, y), in inches
+
+    """
+    import shlex
+    positions = {}
+    for line in lines:
+        if not line.startswith('node '):
+            continue
+        # only quoted names need the slower shlex split
+        parts = shlex.split(line) if line.startswith('node "') else line.split(None, 4)
+        positions[parts[1]] = (parts[2], parts[3])
+    return positions
+
+
 class FlowgistonChart:
     # renders the graph in Jupyter
     def _repr_svg_(self):
-        return self.graph._repr_svg_()
+        return self._display_svg().decode(self.graph.encoding)
+
+    NAMING_SCHEMES = ('counter', 'content', 'uuid')
+    # engines that take the previous display's node positions as a starting point
+    SEEDED_ENGINES = ('neato', 'fdp')
+    # the share of new nodes up to which a display reuses the previous positions
+    RESEED_RATIO = 0.25
 
-    def __init__(self, flowgiston_base_klass=None):
+    def __init__(self, flowgiston_base_klass=None, cache: 'RenderCache' = None, group_styles: bool = False,
+                 naming: str = 'counter', backend: 'RenderBackend' = None,
+                 instrumentation: 'Instrumentation' = None, unique_edges: bool = False, optimize_svg: bool = False):
         """
+        Nodes and edges are kept in a compact columnar store on the chart; DOT text is only generated when the chart
+        is saved, rendered or displayed.  ``self.graph`` holds the graph-level settings (attributes, format, engine,
+        filename) and anything added to it directly.
 
         Args:
             flowgiston_base_klass: a class of type FlowgistonBase
+            cache: (Optional) a RenderCache used by render, pipe and Jupyter display to skip re-rendering unchanged
+                charts
+            group_styles: If True, nodes are emitted in one subgraph per FlowgistonBase class, with the class style
+                given once as node defaults and only per-node overrides on each node line.  This makes the DOT much
+                smaller for large charts built from a few node classes.
+            naming: How nodes are named in the DOT source.  'counter' (the default) numbers nodes in creation order,
+                'content' derives names from each node's class and label, so a node keeps its name when unrelated
+                nodes are added or removed, and 'uuid' gives every node a random, globally unique name.  'counter'
+                and 'content' both make identical charts produce identical output.
+            backend: (Optional) the RenderBackend used to lay out and render the chart.  Defaults to running the
+                graphviz command line tools in a subprocess.
+            instrumentation: (Optional) an Instrumentation recording counters and timings for this chart's node and
+                edge creation, DOT generation, saving, rendering and cache lookups.  Adds next to no overhead when
+                not given.
+            unique_edges: If True, adding an edge the chart already has (same source, destination and label) does
+                nothing.  Checked against a hash set of the chart's edges, so it costs one set lookup per edge.
+            optimize_svg: If True, SVG from render, render_async and Jupyter display is shrunk as by optimized_svg:
+                comments, titles and whitespace are stripped, style attributes become CSS classes named after the
+                nodes' FlowgistonBase classes and ids are shortened.
         """
-        self.graph = Digraph()
+        self.backend = SubprocessBackend() if backend is None else backend
+        self.instrumentation = instrumentation
+        if naming not in self.NAMING_SCHEMES:
+            raise ValueError('unknown naming scheme: %r' % naming)
+        self.naming = naming
+        self._name_counts = {}
+        # the number of the next 'counter' name, and how many node names have been checked against it
+        self._counter = 0
+        self._counter_checked = 0
+        # bumped on every change to the node and edge store
+        self.version = 0
+        # the last Jupyter display as (state, svg), the node positions it was laid out with, and positions being
+        # seeded into the layout in progress
+        self._display = None
+        self._layout_positions = {}
+        self._positions = None
+        self._graph = None
+        self.cache = cache
+        self.group_styles = group_styles
+        self.unique_edges = unique_edges
+        self.optimize_svg = optimize_svg
+        # (tail, head, label) of every edge, for unique_edges, and the number of edges in it
+        self._edge_keys = None
+        self._edge_keys_count = 0
+
+        # node store: one entry per node, indexed by the node's integer id
+        self._node_names = []
+        self._node_labels = []
+        self._node_kinds = array('l')
+        self._node_styles = array('l')
+
+        # edge store: one entry per edge, endpoints are node ids
+        self._edge_tails = array('l')
+        self._edge_heads = array('l')
+        self._edge_labels = []
+        self._edge_styles = array('l')
+
+        # interned style tuples and the FlowgistonBase instances nodes were created from
+        self._styles = []
+        self._style_ids = {}
+        self._kinds = []
+        self._kind_ids = {}
+
+        # clusters as (label, node ids) pairs, and the per-template id mappings used by stamp
+        self._clusters = []
+        self._template_maps = {}
+        # the adjacency index behind the graph queries, built on first use
+        self._index = None
+
+        # per-thread buffers for concurrent construction, by name and by slot, and the buffer bound to each thread
+        self._buffers = {}
+        self._buffer_slots = []
+        self._buffer_lock = threading.RLock()
+        self._local = threading.local()
 
         if flowgiston_base_klass is None:
             self.flowgiston_base_klass = flowgiston_base()
         else:
             self.flowgiston_base_klass = flowgiston_base_klass
-        self.Generic = self.flowgiston_base_klass(self)
-        for klass in self.flowgiston_base_klass.__subclasses__():
-            setattr(self, klass.__name__, klass(self))
+
+    def __getattr__(self, name: str) -> 'FlowgistonBase':
+        """
+        Resolves ``Generic`` and the FlowgistonBase subclasses (including subclasses of subclasses) by class name, the
+        first time each one is used, so creating a chart doesn't instantiate every class.
+        Args:
+            name: A class name
+
+        Returns: An instance of the named class, bound to this chart
+
+        """
+        if name.startswith('_'):
+            # columns of a chart loaded with flowgiston.binary are built on first use
+            mapped = self.__dict__.get('_mapped')
+            if mapped is not None and name in mapped.pending:
+                value = mapped.build(name)
+                setattr(self, name, value)
+                return value
+        elif 'flowgiston_base_klass' in self.__dict__:
+            # resolved under the lock, so threads using a class for the first time at once share one instance
+            with self._buffer_lock:
+                instance = self.__dict__.get(name)
+                if instance is not None:
+                    return instance
+                klass = self._find_class(name)
+                if klass is not None:
+                    return self.__dict__.setdefault(name, klass(self))
+        raise AttributeError('%r object has no attribute %r' % (type(self).__name__, name))
+
+    def _find_class(self, name: str):
+        """
+        Finds the class behind a chart attribute: ``Generic`` is the base class itself, any other name is looked up
+        among its subclasses, breadth first.
+        Args:
+            name: A class name
+
+        Returns: The class, or None
+
+        """
+        if name == 'Generic':
+            return self.flowgiston_base_klass
+        queue = list(self.flowgiston_base_klass.__subclasses__())
+        for klass in queue:
+            if klass.__name__ == name:
+                return klass
+            queue.extend(klass.__subclasses__())
+        return None
+
+    @property
+    def graph(self) -> 'graphviz.Digraph':
+        """
+        The graphviz.Digraph holding the chart's graph-level settings: attributes, format, engine, encoding and
+        filename.  Created on first use, so graphviz isn't imported until a chart is configured, saved or rendered.
+        Returns: graphviz.Digraph
+
+        """
+        if self._graph is None:
+            from graphviz import Digraph
+            self._graph = Digraph()
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph: 'graphviz.Digraph'):
+        self._graph = graph
+
+    def _intern_style(self, style: dict) -> int:
+        """
+        Returns the id of a style, adding it to the style table if it hasn't been seen before.  Attributes set to
+        None are dropped, as graphviz does.
+        Args:
+            style: a dict of graphviz attributes
+
+        Returns: int
+
+        """
+        key = tuple(sorted((k, v) for k, v in style.items() if v is not None))
+        style_id = self._style_ids.get(key)
+        if style_id is None:
+            style_id = self._style_ids[key] = len(self._styles)
+            self._styles.append(key)
+        return style_id
+
+    def _kind_id(self, kind: 'FlowgistonBase') -> int:
+        """
+        Returns the id of a FlowgistonBase instance in this chart's kind table, adding it if needed.
+        Args:
+            kind: A FlowgistonBase instance
+
+        Returns: int
+
+        """
+        kind_id = self._kind_ids.get(kind)
+        if kind_id is None:
+            kind_id = self._kind_ids[kind] = len(self._kinds)
+            self._kinds.append(kind)
+        return kind_id
+
+    def _new_name(self, kind: 'FlowgistonBase', label: str) -> str:
+        """
+        Returns the name for the next node, according to the chart's naming scheme.
+        Args:
+            kind: The FlowgistonBase instance creating the node
+            label: The node's label
+
+        Returns: str
+
+        """
+        if self._buffers:
+            buffer = getattr(self._local, 'buffer', None)
+            if buffer is not None:
+                return buffer.new_name(kind, label)
+        if self.naming == 'counter':
+            return 'n%d' % self._reserve_counter(1)
+        if self.naming == 'content':
+            key = '%s\0%s' % (type(kind).__name__, label)
+            seen = self._name_counts.get(key, 0)
+            self._name_counts[key] = seen + 1
+            return 'n_' + blake2b(('%s\0%d' % (key, seen)).encode('utf-8'), digest_size=8).hexdigest()
+        from uuid import uuid4
+        return 'n_' + uuid4().hex
+
+    def _reserve_counter(self, count: int) -> int:
+        """
+        Reserves ``count`` consecutive 'counter' names for nodes about to be added.  Numbering continues past the
+        highest ``n<k>`` name already in the chart, so names from a loaded file or copied from another chart are
+        never handed out again.
+        Args:
+            count: The number of names
+
+        Returns: The number of the first name
+
+        """
+        names = self._node_names
+        if len(names) > self._counter_checked:
+            counter = self._counter
+            for name in names[self._counter_checked:]:
+                if name[:1] == 'n' and name[1:].isdecimal():
+                    counter = max(counter, int(name[1:]) + 1)
+            self._counter = counter
+        start = self._counter
+        self._counter += count
+        # the reserved names are added next, and needn't be checked
+        self._counter_checked = len(names) + count
+        return start
+
+    def _add_node(self, name: str, label: str, style: dict, kind: 'FlowgistonBase') -> int:
+        """
+        Adds a node to the node store.
+        Args:
+            name: The node's DOT identifier
+            label: Label for this node
+            style: A dict of graphviz node attributes
+            kind: The FlowgistonBase instance that created this node
+
+        Returns: The integer id of the new node, or a provisional id if it went into a buffer
+
+        """
+        if self._buffers:
+            buffer = getattr(self._local, 'buffer', None)
+            if buffer is not None:
+                return buffer.add_node(name, label, style, kind)
+        index = len(self._node_names)
+        self.version += 1
+        self._node_names.append(name)
+        self._node_labels.append(label)
+        self._node_kinds.append(self._kind_id(kind))
+        self._node_styles.append(self._intern_style(style))
+        return index
+
+    def _add_edge(self, tail: int, head: int, label: str, style: dict) -> None:
+        """
+        Adds an edge to the edge store.
+        Args:
+            tail: Id of the source node
+            head: Id of the destination node
+            label: Label for this edge
+            style: A dict of graphviz edge attributes
+
+        Returns: None
+
+        """
+        if self._buffers:
+            buffer = getattr(self._local, 'buffer', None)
+            if buffer is not None:
+                buffer.add_edge(tail, head, label, style)
+                return
+            tail = self._resolve(tail)
+            head = self._resolve(head)
+        if self.instrumentation is not None:
+            start = perf_counter()
+        if self.unique_edges:
+            keys = self._edge_key_set()
+            if (tail, head, label) in keys:
+                return
+            keys.add((tail, head, label))
+            self._edge_keys_count += 1
+        self.version += 1
+        self._edge_tails.append(tail)
+        self._edge_heads.append(head)
+        self._edge_labels.append(label)
+        self._edge_styles.append(self._intern_style(style))
+        if self.instrumentation is not None:
+            self.instrumentation.record('edge', perf_counter() - start, notify=False)
+
+    def _edge_key_set(self) -> set:
+        """
+        Returns the set of (tail, head, label) keys behind unique_edges, first adding the edges added to the chart
+        since it was last used.
+        Returns: set
+
+        """
+        if self._edge_keys is None:
+            self._edge_keys = set()
+            self._edge_keys_count = 0
+        count = len(self._edge_tails)
+        if self._edge_keys_count < count:
+            start = self._edge_keys_count
+            self._edge_keys.update(zip(self._edge_tails[start:], self._edge_heads[start:], self._edge_labels[start:]))
+            self._edge_keys_count = count
+        return self._edge_keys
+
+    def _unique_edges(self, tails: array, heads: array, labels: list, style_ids: array) -> tuple:
+        """
+        Drops the edges of a batch that the chart already has, or that come earlier in the batch, and marks the rest
+        as added.
+        Returns: The (tails, heads, labels, style ids) of the edges to add
+
+        """
+        keys = self._edge_key_set()
+        size = len(keys)
+        keep = []
+        for position, key in enumerate(zip(tails, heads, labels)):
+            keys.add(key)
+            if len(keys) > size:
+                size += 1
+                keep.append(position)
+        self._edge_keys_count += len(keep)
+        if len(keep) == len(tails):
+            return tails, heads, labels, style_ids
+        return (array('l', map(tails.__getitem__, keep)), array('l', map(heads.__getitem__, keep)),
+                list(map(labels.__getitem__, keep)), array('l', map(style_ids.__getitem__, keep)))
+
+    def _iter_source(self):
+        """
+        Yields the DOT source for this chart line by line.  Graph-level lines come from ``self.graph``, followed by
+        every node and then every edge in the store.
+        Returns: generator of str
+
+        """
+        self._merge_buffers()
+        from graphviz import lang
+        quote = lang.quote
+        quote_edge = lang.quote_edge
+        styles = self._styles
+        # each distinct style is formatted once, however many nodes or edges share it
+        formatted = {}
+
+        def a_list(items):
+            return ' '.join('%s=%s' % (quote(k), quote(v)) for k, v in items)
+
+        def style_list(style_id):
+            attrs = formatted.get(style_id)
+            if attrs is None:
+                attrs = formatted[style_id] = a_list(styles[style_id])
+            return attrs
+
+        def attr_list(label, attrs):
+            if label is not None:
+                attrs = 'label=%s %s' % (quote(label), attrs) if attrs else 'label=%s' % quote(label)
+            return ' [%s]' % attrs if attrs else ''
+
+        if self._graph is None:
+            lines = ['digraph {']
+            tail = '}'
+        else:
+            lines = list(self._graph)
+            tail = lines.pop()
+        for line in lines:
+            yield line
+
+        names = self._node_names
+        labels = self._node_labels
+        node_styles = self._node_styles
+        if self.group_styles:
+            ungrouped = array('l')
+            for line in self._iter_grouped_nodes(a_list, attr_list, ungrouped):
+                yield line
+            for index in ungrouped:
+                yield '\t%s%s' % (quote(names[index]), attr_list(labels[index], style_list(node_styles[index])))
+        else:
+            for name, label, style_id in zip(names, labels, node_styles):
+                yield '\t%s%s' % (quote(name), attr_list(label, style_list(style_id)))
+        if self._positions:
+            # declaring a node again adds to its attributes
+            for name, pos in self._positions.items():
+                yield '\t%s [pos=%s]' % (quote(name), quote(pos))
+
+        # nodes are declared above; naming them again inside a cluster subgraph makes them members
+        for number, (label, members) in enumerate(self._clusters):
+            yield '\tsubgraph cluster_%d {' % number
+            if label is not None:
+                yield '\t\tlabel=%s' % quote(label)
+            for index in members:
+                yield '\t\t%s' % quote(names[index])
+            yield '\t}'
+
+        for t, h, label, style_id in zip(self._edge_tails, self._edge_heads, self._edge_labels, self._edge_styles):
+            yield '\t%s -> %s%s' % (quote_edge(names[t]), quote_edge(names[h]), attr_list(label, style_list(style_id)))
+
+        yield tail
+
+    def _iter_grouped_nodes(self, a_list, attr_list, ungrouped):
+        """
+        Yields the node lines grouped by the FlowgistonBase they were created from.  Each group is an anonymous
+        subgraph whose ``node [...]`` defaults carry the class style, so each node line only lists its overrides.
+        Nodes that can't be expressed as overrides (because they dropped one of the class attributes) are appended to
+        ``ungrouped`` for the caller to emit with their full style.
+        Args:
+            a_list: formats a sequence of attribute items
+            attr_list: formats a label and a formatted a_list into a node's attribute list
+            ungrouped: an array collecting the ids of nodes left out of the groups
+
+        Returns: generator of str
+
+        """
+        from graphviz import lang
+        quote = lang.quote
+        names = self._node_names
+        labels = self._node_labels
+        node_styles = self._node_styles
+        styles = self._styles
+
+        groups = {}
+        for index, kind_id in enumerate(self._node_kinds):
+            members = groups.get(kind_id)
+            if members is None:
+                members = groups[kind_id] = array('l')
+            members.append(index)
+
+        for kind_id, members in groups.items():
+            defaults = {k: v for k, v in self._kinds[kind_id]._base_style.items() if v is not None}
+            if not defaults:
+                ungrouped.extend(members)
+                continue
+
+            # style id -> formatted overrides, or None if the style can't be expressed as overrides
+            overrides = {}
+            yield '\tsubgraph {'
+            yield '\t\tnode [%s]' % a_list(sorted(defaults.items()))
+            for index in members:
+                style_id = node_styles[index]
+                try:
+                    attrs = overrides[style_id]
+                except KeyError:
+                    style = styles[style_id]
+                    if len(defaults.keys() & dict(style).keys()) < len(defaults):
+                        attrs = None
+                    else:
+                        attrs = a_list((k, v) for k, v in style if defaults.get(k) != v)
+                    overrides[style_id] = attrs
+                if attrs is None:
+                    ungrouped.append(index)
+                else:
+                    yield '\t\t%s%s' % (quote(names[index]), attr_list(labels[index], attrs))
+            yield '\t}'
+
+    @property
+    def source(self) -> str:
+        """
+        The DOT source for this chart.  Built on each access.
+        Returns: str
+
+        """
+        with self._phase('source') as data:
+            source = '\n'.join(self._iter_source())
+            if self.instrumentation is not None:
+                data['bytes'] = len(source.encode(self.graph.encoding))
+        return source
+
+    def _phase(self, event: str, **data):
+        """
+        Returns a context manager timing a block as an instrumentation event, or a no-op one if the chart isn't
+        instrumented.
+        Args:
+            event: The event name
+            **data: Details recorded with the event
+
+        Returns: A context manager yielding the event's data dict
+
+        """
+        if self.instrumentation is None:
+            return nullcontext(data)
+        return self.instrumentation.phase(event, **data)
+
+    def _cache_lookup(self, key: str, format: str) -> bytes:
+        """
+        Looks a key up in the render cache, recording the hit or miss if the chart is instrumented.
+        Returns: The cached bytes, or None
+
+        """
+        out = self.cache.get(key)
+        if self.instrumentation is not None:
+            self.instrumentation.record('cache_miss' if out is None else 'cache_hit', 0.0, format=format)
+        return out
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the chart's size and, if it's instrumented, the counters and timings recorded so far.
+        Counters and timings are those of the chart's Instrumentation, so they cover every chart sharing it.
+        Returns: dict
+
+        """
+        self._merge_buffers()
+        stats = {
+            'nodes': len(self._node_names),
+            'edges': len(self._edge_tails),
+            'styles': len(self._styles),
+        }
+        if self.instrumentation is not None:
+            stats.update(self.instrumentation.snapshot())
+        if self.cache is not None:
+            stats['cache'] = self.cache.cache_info()._asdict()
+        return stats
 
     def edge(self, n1: 'FlowgistonNode', n2: 'FlowgistonNode', label: str, **kwargs) -> None:
         """
@@ -212,7 +779,25 @@ class FlowgistonChart:
         Returns: None
 
         """
-        self.graph.edge(n1.name, n2.name, label, **kwargs)
+        self._add_edge(self._edge_end(n1), self._edge_end(n2), label, kwargs)
+
+    def _edge_end(self, node) -> int:
+        """
+        Returns the id of an edge's end, given as a FlowgistonNode or an id.
+        Args:
+            node: A FlowgistonNode or a node id
+
+        Returns: int
+
+        Raises:
+            ValueError: If the node belongs to another chart
+
+        """
+        if not isinstance(node, FlowgistonNode):
+            return node
+        if node.flowbase.fchart is not self:
+            raise ValueError('%r belongs to another chart' % node)
+        return node.index
 
     def yes(self, n1: 'FlowgistonNode', n2: 'FlowgistonNode', **kwargs) -> None:
         """
@@ -240,6 +825,63 @@ class FlowgistonChart:
         """
         self.edge(n1, n2, 'No', **kwargs)
 
+    def _connect(self, tails, heads, labels, style: dict) -> None:
+        """
+        Adds edges between nodes, given as FlowgistonNodes or ids, in one batch.  Inside a buffer, or while buffers
+        are open, they're added one at a time instead.
+        Args:
+            tails: A list of source nodes
+            heads: A list of destination nodes, one per source
+            labels: A label for every edge, or a sequence of labels, one per edge
+            style: A dict of graphviz edge attributes for every edge
+
+        Returns: None
+
+        """
+        tails = list(map(self._edge_end, tails))
+        heads = list(map(self._edge_end, heads))
+        if self._buffers:
+            if labels is None or isinstance(labels, str):
+                labels = [labels] * len(tails)
+            elif len(labels) != len(tails):
+                raise ValueError('got %d labels for %d edges' % (len(labels), len(tails)))
+            for tail, head, label in zip(tails, heads, labels):
+                self._add_edge(tail, head, label, style)
+            return
+        with self._phase('add_edges') as data:
+            data['count'] = self._add_edges(tails, heads, labels, style)
+
+    def fan_in(self, sources, dest: 'FlowgistonNode', labels=None, **kwargs) -> 'FlowgistonNode':
+        """
+        Creates an edge from each of several nodes to one node, in one batch.
+        Args:
+            sources: An iterable of source nodes
+            dest: The destination node
+            labels: (Optional) a label for every edge, or a sequence of labels, one per source
+            **kwargs: Keyword args for styling the edges
+
+        Returns: The destination node
+
+        """
+        sources = list(sources)
+        self._connect(sources, [dest] * len(sources), labels, kwargs)
+        return dest
+
+    def chain(self, nodes, labels=None, **kwargs) -> 'FlowgistonNode':
+        """
+        Creates an edge from each node to the next, in one batch.
+        Args:
+            nodes: An iterable of nodes, in order
+            labels: (Optional) a label for every edge, or a sequence of labels, one per edge (one fewer than nodes)
+            **kwargs: Keyword args for styling the edges
+
+        Returns: The last node, or None if there are no nodes
+
+        """
+        nodes = list(nodes)
+        self._connect(nodes[:-1], nodes[1:], labels, kwargs)
+        return nodes[-1] if nodes else None
+
     def start(self, label: str, **kwargs) -> 'FlowgistonNode':
         """
         Create a default styled Start node
@@ -300,50 +942,949 @@ class FlowgistonChart:
         """
         return self.Generic.conditional(label, **kwargs)
 
+    def add_nodes(self, labels, kind=None, styles=None) -> range:
+        """
+        Adds a batch of nodes in one step.  Much faster than creating nodes one at a time, and no FlowgistonNode is
+        built for each node: the new nodes are referred to by their integer ids, e.g. in add_edges.
+        Args:
+            labels: A sequence, NumPy array or pandas Series of labels.  A None label falls back to the kind's
+                default label.
+            kind: The FlowgistonBase instance (e.g. ``chart.Stop``), or its name, whose styling the nodes get, or a
+                list of them, one per node.  Defaults to Generic.
+            styles: (Optional) either a dict of styling applied to every node, or a sequence of dicts, one per node
+
+        Returns: The ids of the new nodes, as a range
+
+        """
+        with self._phase('add_nodes') as data:
+            ids = self._add_nodes(labels, kind, styles)
+            data['count'] = len(ids)
+        return ids
+
+    def _as_kind(self, kind) -> 'FlowgistonBase':
+        """
+        Returns the FlowgistonBase instance for a kind given as an instance, a class name or None (for Generic).
+        Returns: FlowgistonBase
+
+        """
+        if kind is None:
+            return self.Generic
+        if isinstance(kind, str):
+            return getattr(self, kind)
+        return kind
+
+    def _add_nodes(self, labels, kind, styles) -> range:
+        """
+        Does the work of add_nodes.
+        Returns: range
+
+        """
+        self._check_unbuffered()
+        labels = _as_list(labels)
+        count = len(labels)
+        if isinstance(kind, (list, tuple)):
+            if len(kind) != count:
+                raise ValueError('got %d kinds for %d nodes' % (len(kind), count))
+            resolved = {}
+            kinds = [resolved[k] if k in resolved else resolved.setdefault(k, self._as_kind(k)) for k in kind]
+            if any(getattr(k, 'label', None) is not None for k in resolved.values()):
+                labels = [getattr(k, 'label', None) if label is None else label for k, label in zip(kinds, labels)]
+        else:
+            kind = self._as_kind(kind)
+            kinds = None
+            default_label = getattr(kind, 'label', None)
+            if default_label is not None:
+                labels = [default_label if label is None else label for label in labels]
+
+        if kinds is None and (styles is None or isinstance(styles, dict)):
+            style_ids = array('l', [self._intern_style(self._node_style(kind, styles or {}))]) * count
+        else:
+            if styles is None or isinstance(styles, dict):
+                styles = [styles or {}] * count
+            else:
+                styles = _as_list(styles)
+            if len(styles) != count:
+                raise ValueError('got %d styles for %d nodes' % (len(styles), count))
+            # nodes in a batch mostly share a few styles, so each distinct one is only merged and interned once
+            seen = {}
+            style_ids = array('l')
+            for k, style in zip(kinds or [kind] * count, styles):
+                key = (k, tuple(style.items()))
+                style_id = seen.get(key)
+                if style_id is None:
+                    style_id = seen[key] = self._intern_style(self._node_style(k, style))
+                style_ids.append(style_id)
+
+        start = len(self._node_names)
+        self.version += 1
+        if self.naming == 'counter':
+            first = self._reserve_counter(count)
+            self._node_names.extend(['n%d' % i for i in range(first, first + count)])
+        elif kinds is None:
+            self._node_names.extend([kind._name(label) for label in labels])
+        else:
+            self._node_names.extend([k._name(label) for k, label in zip(kinds, labels)])
+        self._node_labels.extend(labels)
+        if kinds is None:
+            self._node_kinds.extend(array('l', [self._kind_id(kind)]) * count)
+        else:
+            kind_ids = {k: self._kind_id(k) for k in resolved.values()}
+            self._node_kinds.extend(array('l', map(kind_ids.__getitem__, kinds)))
+        self._node_styles.extend(style_ids)
+        return range(start, start + count)
+
+    @staticmethod
+    def _node_style(kind: 'FlowgistonBase', style: dict) -> dict:
+        """
+        Merges per-node styling into a kind's style, as FlowgistonBase._nodegen does.
+        Returns: dict
+
+        """
+        style = kind._construct_style(**style)
+        style.pop('label', None)
+        return style
+
+    def add_edges(self, tails, heads, labels=None, styles=None) -> None:
+        """
+        Adds a batch of edges in one step.
+        Args:
+            tails: A sequence, NumPy array or pandas Series of source node ids
+            heads: A sequence, NumPy array or pandas Series of destination node ids
+            labels: (Optional) a label for every edge, or a sequence of labels, one per edge
+            styles: (Optional) either a dict of styling applied to every edge, or a sequence of dicts, one per edge
+
+        Returns: None
+
+        """
+        with self._phase('add_edges') as data:
+            data['count'] = self._add_edges(tails, heads, labels, styles)
+
+    def _add_edges(self, tails, heads, labels, styles) -> int:
+        """
+        Does the work of add_edges.
+        Returns: The number of edges added
+
+        """
+        self._check_unbuffered()
+        tails = array('l', _as_list(tails))
+        heads = array('l', _as_list(heads))
+        count = len(tails)
+        if len(heads) != count:
+            raise ValueError('got %d tails but %d heads' % (count, len(heads)))
+        if count:
+            nodes = len(self._node_names)
+            if min(min(tails), min(heads)) < 0 or max(max(tails), max(heads)) >= nodes:
+                raise IndexError('edge endpoint out of range for a chart with %d nodes' % nodes)
+
+        if labels is None or isinstance(labels, str):
+            labels = [labels] * count
+        else:
+            labels = _as_list(labels)
+            if len(labels) != count:
+                raise ValueError('got %d labels for %d edges' % (len(labels), count))
+
+        if styles is None or isinstance(styles, dict):
+            style_ids = array('l', [self._intern_style(styles or {})]) * count
+        else:
+            style_ids = array('l', (self._intern_style(style) for style in styles))
+            if len(style_ids) != count:
+                raise ValueError('got %d styles for %d edges' % (len(style_ids), count))
+
+        if self.unique_edges:
+            tails, heads, labels, style_ids = self._unique_edges(tails, heads, labels, style_ids)
+            count = len(tails)
+        self.version += 1
+        self._edge_tails.extend(tails)
+        self._edge_heads.extend(heads)
+        self._edge_labels.extend(labels)
+        self._edge_styles.extend(style_ids)
+        return count
+
+    def stamp(self, template: 'SubflowTemplate', cluster: bool = False, label: str = None) -> 'SubflowInstance':
+        """
+        Adds a copy of a sub-flow template to this chart.  The template's styles and node classes are mapped onto
+        this chart once and reused for every later stamp, so each stamp only copies the template's arrays and offsets
+        its node ids.
+        Args:
+            template: A SubflowTemplate
+            cluster: If True, the copy is drawn as a graphviz cluster (a box around its nodes)
+            label: A label for the cluster.  Defaults to the template's name.
+
+        Returns: A SubflowInstance with the copy's node ids, and its entry and exit nodes as FlowgistonNodes
+
+        """
+        self._check_unbuffered()
+        from .template import SubflowInstance
+        kinds, styles, edge_styles = self._template_map(template)
+        offset = len(self._node_names)
+        count = len(template._node_names)
+        self.version += 1
+
+        if self.naming == 'counter':
+            first = self._reserve_counter(count)
+            names = list(map('n{}'.format, range(first, first + count)))
+        else:
+            prefix = self._new_name(template, template.name)
+            names = list(map((prefix + '_{}').format, range(count)))
+        self._node_names.extend(names)
+        self._node_labels.extend(template._node_labels)
+        self._node_kinds.extend(kinds)
+        self._node_styles.extend(styles)
+
+        self._edge_tails.extend(map(offset.__add__, template._edge_tails))
+        self._edge_heads.extend(map(offset.__add__, template._edge_heads))
+        self._edge_labels.extend(template._edge_labels)
+        self._edge_styles.extend(edge_styles)
+
+        nodes = range(offset, offset + count)
+        if cluster:
+            self._clusters.append((template.name if label is None else label, nodes))
+        entry = None if template.entry is None else self.get_node(offset + template.entry.index)
+        exits = {name: self.get_node(offset + node.index) for name, node in template.exits.items()}
+        return SubflowInstance(nodes, entry, exits)
+
+    def _template_map(self, template: 'SubflowTemplate') -> tuple:
+        """
+        Returns a template's node kinds, node styles and edge styles translated into this chart's kind and style ids.
+        Computed on the first stamp and again only if the template has grown since.
+        Args:
+            template: A SubflowTemplate
+
+        Returns: A (node kinds, node styles, edge styles) tuple of arrays
+
+        """
+        version = (len(template._node_names), len(template._edge_tails), len(template._styles))
+        cached = self._template_maps.get(template)
+        if cached is None or cached[0] != version:
+            kind_map = [self._kind_id(self._kind_for_class(type(kind))) for kind in template._kinds]
+            style_map = [self._intern_style(dict(style)) for style in template._styles]
+            cached = self._template_maps[template] = (
+                version,
+                array('l', [kind_map[k] for k in template._node_kinds]),
+                array('l', [style_map[s] for s in template._node_styles]),
+                array('l', [style_map[s] for s in template._edge_styles]),
+            )
+        return cached[1:]
+
+    def _kind_for_class(self, klass) -> 'FlowgistonBase':
+        """
+        Returns this chart's instance of a FlowgistonBase class, creating one if the chart has none yet.
+        Args:
+            klass: A FlowgistonBase class
+
+        Returns: FlowgistonBase
+
+        """
+        for kind in self._kinds:
+            if type(kind) is klass:
+                return kind
+        if klass is self.flowgiston_base_klass:
+            return self.Generic
+        kind = self.__dict__.get(klass.__name__)
+        if type(kind) is klass:
+            return kind
+        kind = klass(self)
+        if klass.__name__ not in self.__dict__ and self._find_class(klass.__name__) is klass:
+            setattr(self, klass.__name__, kind)
+        return kind
+
+    @contextmanager
+    def buffer(self, name: str):
+        """
+        Lets the calling thread add nodes and edges concurrently with other threads.  Inside the ``with`` block, the
+        nodes and edges this thread creates (with the per-node API: node, process, edge, yes, ...) go to a buffer of
+        its own, with no locking.  Buffers are merged into the chart when it's next saved, rendered or queried, in
+        order of buffer name, so the output doesn't depend on how the threads were scheduled:
+
+            def trace(subsystem):
+                with chart.buffer(subsystem.name):
+                    ...
+
+            threads = [threading.Thread(target=trace, args=(s,)) for s in subsystems]
+
+        Edges may connect nodes from any buffers.  Nodes created in a buffer get provisional ids until they're
+        merged, and, with counter naming, names made from the buffer name (``<name>.<n>``).  Bulk methods (add_nodes,
+        add_edges, stamp) can't be used inside a buffer.  Save or render the chart once the threads are done.
+        Args:
+            name: The buffer's name.  Only one thread at a time can use a buffer; later threads may carry on with it.
+
+        Returns: A context manager
+
+        """
+        from .concurrent import ChartBuffer
+        with self._buffer_lock:
+            buffer = self._buffers.get(name)
+            if buffer is None:
+                buffer = ChartBuffer(self, name, len(self._buffer_slots))
+                self._buffer_slots.append(buffer)
+                self._buffers[name] = buffer
+            elif buffer.thread is not None and buffer.thread != threading.get_ident():
+                raise RuntimeError('buffer %r is in use by another thread' % name)
+            buffer.thread = threading.get_ident()
+        previous = getattr(self._local, 'buffer', None)
+        self._local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = previous
+            if previous is not buffer:
+                buffer.thread = None
+
+    def _check_unbuffered(self) -> None:
+        """
+        Raises RuntimeError if the calling thread is inside a buffer.
+        """
+        if self._buffers and getattr(self._local, 'buffer', None) is not None:
+            raise RuntimeError('bulk methods cannot be used inside a buffer')
+
+    def _merge_buffers(self) -> None:
+        """
+        Moves the nodes and edges waiting in buffers into the chart's store: first every buffer's nodes, then every
+        buffer's edges, each in order of buffer name.
+        Returns: None
+
+        """
+        if not self._buffers:
+            return
+        with self._buffer_lock:
+            buffers = sorted(self._buffers.values(), key=lambda b: b.name)
+            # rows are complete once their last column is written.  Edge counts are read before node counts, so
+            # every node a counted edge points to is counted too, even while the threads are still adding to them.
+            edge_counts = [len(b.edge_styles) for b in buffers]
+            pending = [(b, len(b.node_styles), edges) for b, edges in zip(buffers, edge_counts)]
+            if not any(nodes or edges for _, nodes, edges in pending):
+                return
+
+            for buffer, count, _ in pending:
+                if not count:
+                    continue
+                buffer.segment_starts.append(buffer.first)
+                buffer.segment_offsets.append(len(self._node_names))
+                self._node_names.extend(buffer.node_names[:count])
+                self._node_labels.extend(buffer.node_labels[:count])
+                self._node_kinds.extend(buffer.node_kinds[:count])
+                self._node_styles.extend(buffer.node_styles[:count])
+                del buffer.node_names[:count], buffer.node_labels[:count]
+                del buffer.node_kinds[:count], buffer.node_styles[:count]
+                buffer.first += count
+
+            for buffer, _, count in pending:
+                if not count:
+                    continue
+                tails = array('l', (self._resolve(tail, False) for tail in buffer.edge_tails[:count]))
+                heads = array('l', (self._resolve(head, False) for head in buffer.edge_heads[:count]))
+                labels = buffer.edge_labels[:count]
+                style_ids = buffer.edge_styles[:count]
+                if self.unique_edges:
+                    tails, heads, labels, style_ids = self._unique_edges(tails, heads, labels, style_ids)
+                self._edge_tails.extend(tails)
+                self._edge_heads.extend(heads)
+                self._edge_labels.extend(labels)
+                self._edge_styles.extend(style_ids)
+                del buffer.edge_tails[:count], buffer.edge_heads[:count]
+                del buffer.edge_labels[:count], buffer.edge_styles[:count]
+            self.version += 1
+
+    def _resolve(self, index: int, merge: bool = True) -> int:
+        """
+        Returns the chart id for a node id, merging buffers if it's a provisional id that hasn't been merged yet.
+        Args:
+            index: A node id or provisional id
+            merge: If False, an unmerged provisional id is an error
+
+        Returns: int
+
+        """
+        if index >= 0:
+            return index
+        from .concurrent import split_id
+        slot, local = split_id(index)
+        buffer = self._buffer_slots[slot]
+        resolved = buffer.resolve(local)
+        if resolved is None and merge:
+            self._merge_buffers()
+            resolved = buffer.resolve(local)
+            if resolved is None:
+                raise RuntimeError('node %d of buffer %r is still being written' % (local, buffer.name))
+        return resolved
+
+    def get_node(self, index: int) -> 'FlowgistonNode':
+        """
+        Returns a FlowgistonNode for a node id, e.g. one returned by add_nodes
+        Args:
+            index: A node id
+
+        Returns: A FlowgistonNode
+
+        """
+        index = self._resolve(index)
+        return FlowgistonNode(self._node_names[index], self._node_labels[index],
+                              self._kinds[self._node_kinds[index]], index)
+
+    def _adjacency(self) -> 'AdjacencyIndex':
+        """
+        Returns the chart's adjacency index, brought up to date with any nodes and edges added since it was last used.
+        Returns: AdjacencyIndex
+
+        """
+        self._merge_buffers()
+        if self._index is None:
+            from .index import AdjacencyIndex
+            self._index = AdjacencyIndex(self)
+        return self._index.sync()
+
+    def _node_id(self, node) -> int:
+        """
+        Returns the id of a FlowgistonNode, or the id itself if given one.
+        Returns: int
+
+        """
+        return self._resolve(node.index if isinstance(node, FlowgistonNode) else int(node))
+
+    def successors(self, node, label=False) -> list:
+        """
+        Returns the nodes a node has edges to, in the order the edges were added.
+        Args:
+            node: A FlowgistonNode or node id
+            label: If given, only edges with this label are followed, e.g. 'Yes'.  None follows unlabelled edges.
+
+        Returns: list of FlowgistonNode
+
+        """
+        return [self.get_node(i) for i in self._adjacency().successors(self._node_id(node), label)]
+
+    def predecessors(self, node, label=False) -> list:
+        """
+        Returns the nodes with edges to a node, in the order the edges were added.
+        Args:
+            node: A FlowgistonNode or node id
+            label: If given, only edges with this label are followed.  None follows unlabelled edges.
+
+        Returns: list of FlowgistonNode
+
+        """
+        return [self.get_node(i) for i in self._adjacency().predecessors(self._node_id(node), label)]
+
+    def reachable_from(self, *nodes) -> list:
+        """
+        Returns the nodes that can be reached from any of the given nodes by following edges, including the nodes
+        themselves.  Takes time linear in the size of the chart.
+        Args:
+            *nodes: FlowgistonNodes or node ids
+
+        Returns: list of FlowgistonNode, in creation order
+
+        """
+        reachable = self._adjacency().reachable_from(map(self._node_id, nodes))
+        return [self.get_node(i) for i in range(len(self._node_names)) if i in reachable]
+
+    def unreachable_from(self, *nodes) -> list:
+        """
+        Returns the nodes that can't be reached from any of the given nodes, e.g. steps no path from the start node
+        leads to.
+        Args:
+            *nodes: FlowgistonNodes or node ids
+
+        Returns: list of FlowgistonNode, in creation order
+
+        """
+        reachable = self._adjacency().reachable_from(map(self._node_id, nodes))
+        return [self.get_node(i) for i in range(len(self._node_names)) if i not in reachable]
+
+    def find_cycles(self) -> list:
+        """
+        Finds the loops in the chart: each strongly connected component with a cycle in it (a set of nodes that can
+        all reach each other, or a node with an edge to itself).  Takes time linear in the size of the chart.
+        Returns: list of lists of FlowgistonNode, one list per component
+
+        """
+        return [[self.get_node(i) for i in component] for component in self._adjacency().strongly_connected()]
+
+    def dangling_conditionals(self) -> list:
+        """
+        Finds conditional (diamond) nodes missing a 'Yes' or a 'No' branch.
+        Returns: list of FlowgistonNode, in creation order
+
+        """
+        index = self._adjacency()
+        labels = self._edge_labels
+        diamonds = {style_id for style_id, style in enumerate(self._styles) if ('shape', 'diamond') in style}
+        dangling = []
+        for node, style_id in enumerate(self._node_styles):
+            if style_id in diamonds:
+                branches = {labels[edge] for edge in index.out_edges[node]}
+                if 'Yes' not in branches or 'No' not in branches:
+                    dangling.append(self.get_node(node))
+        return dangling
+
+    def overview(self, by='kind') -> 'Overview':
+        """
+        Splits the chart into groups of nodes for a collapsed overview, with one summary node per group, and a chart
+        per group to drill down into.  Each is laid out on its own, which is much quicker than laying out a chart of
+        tens of thousands of nodes in one go.
+        Args:
+            by: How nodes are grouped: 'kind' (by FlowgistonBase subclass), 'group' (by the nodes' graphviz ``group``
+                attribute), 'subflows' (by the clusters made with ``stamp(..., cluster=True)``), 'components' (by
+                connected component), or a function taking a FlowgistonNode and returning its group's key (None
+                for nodes left out of any group)
+
+        Returns: Overview
+
+        """
+        from .overview import Overview
+        return Overview(self, by)
+
+    def pipe(self, format=None, renderer=None, formatter=None) -> bytes:
+        """
+        Pipes the chart through the graphviz layout command, the same as graphviz.Digraph.pipe
+        Args:
+            format: The output format (defaults to the graph's format)
+            renderer: The output renderer
+            formatter: The output formatter
+
+        Returns: The rendered output as bytes
+
+        """
+        if format is None:
+            format = self.graph.format
+        if self.cache is None:
+            with self._phase('pipe', format=format):
+                return self.backend.pipe(self, format, renderer, formatter)
+
+        data = self.source.encode(self.graph.encoding)
+        key = self.cache.key(data, self.graph.engine, format, renderer, formatter)
+        out = self._cache_lookup(key, format)
+        if out is None:
+            with self._phase('pipe', format=format):
+                out = self.backend.pipe(self, format, renderer, formatter, data)
+            self.cache.put(key, out)
+        return out
+
+    @property
+    def dirty(self) -> bool:
+        """
+        Whether the chart changed since it was last displayed in Jupyter.
+        Returns: bool
+
+        """
+        return self._display is None or self._display[0] != self._display_state()
+
+    def _display_state(self) -> tuple:
+        """
+        Returns what a Jupyter display depends on: the store's version, the graph-level settings and the chart options
+        that change the SVG.
+        Returns: tuple
+
+        """
+        self._merge_buffers()
+        graph = self.graph
+        return (self.version, graph.engine, graph.encoding, tuple(graph), self.optimize_svg, self.group_styles,
+                self.backend)
+
+    def _display_svg(self) -> bytes:
+        """
+        Renders the chart as SVG for Jupyter.  An unchanged chart returns the last SVG straight away.  With an engine
+        that honours node positions (see SEEDED_ENGINES), nodes already laid out by the previous display are pinned
+        where they were as long as the chart only grew by a little (see RESEED_RATIO), so the layout converges faster
+        and the picture doesn't reshuffle.
+        Returns: The SVG as bytes
+
+        """
+        state = self._display_state()
+        if self._display is not None and self._display[0] == state:
+            return self._display[1]
+
+        if self.graph.engine not in self.SEEDED_ENGINES:
+            svg = self.pipe(format='svg')
+        else:
+            previous = self._layout_positions
+            seeded = {name: previous[name] for name in self._node_names if name in previous}
+            if len(self._node_names) - len(seeded) <= self.RESEED_RATIO * len(seeded):
+                self._positions = {name: '%s,%s!' % pos for name, pos in seeded.items()}
+
+            from tempfile import TemporaryDirectory
+            try:
+                with TemporaryDirectory() as td:
+                    # written directly rather than with save, which would repoint graph.filename and directory
+                    filepath = os.path.join(td, 'display.gv')
+                    with io.open(filepath, 'w', encoding=self.graph.encoding) as fd:
+                        self.write(fd)
+                    svg_path, plain_path = self._render_file(filepath, ['svg', 'plain'])
+                    with open(svg_path, 'rb') as fd:
+                        svg = fd.read()
+                    with open(plain_path, 'r', encoding=self.graph.encoding) as fd:
+                        self._layout_positions = _plain_positions(fd)
+            finally:
+                self._positions = None
+
+        if self.optimize_svg:
+            svg = self._optimize(svg)
+        self._display = (state, svg)
+        return svg
+
+    def _svg_classes(self) -> dict:
+        """
+        Returns the CSS class for each node in optimized SVG: the name of its FlowgistonBase class.
+        Returns: dict of node name -> class name
+
+        """
+        base = self.flowgiston_base_klass
+        names = ['Generic' if type(kind) is base else type(kind).__name__ for kind in self._kinds]
+        return dict(zip(self._node_names, map(names.__getitem__, self._node_kinds)))
+
+    def _optimize(self, svg: bytes) -> bytes:
+        """
+        Shrinks SVG rendered from this chart.
+        Returns: bytes
+
+        """
+        from . import svg as svg_module
+        with self._phase('optimize_svg') as data:
+            optimized = svg_module.optimize(svg, self._svg_classes())
+            data['saved'] = len(svg) - len(optimized)
+        return optimized
+
+    def optimized_svg(self, compress: bool = False) -> bytes:
+        """
+        Renders the chart as SVG made small for browsers: Graphviz's comments, ``<title>`` elements and whitespace are
+        stripped, the style attributes repeated on every shape and text become one CSS class per distinct style
+        (named after the FlowgistonBase class, e.g. ``Alert-polygon``, so a page can restyle a class of nodes), and
+        ids are shortened.
+        Args:
+            compress: If True, the SVG is gzipped, ready to be served with ``Content-Encoding: gzip`` or saved as
+                ``.svgz``
+
+        Returns: The SVG as bytes
+
+        """
+        svg = self._optimize(self.pipe(format='svg'))
+        if compress:
+            import gzip
+            svg = gzip.compress(svg, mtime=0)
+        return svg
+
     def render(self, filename=None, directory=None, view=False, cleanup=False, format=None, renderer=None,
                formatter=None):
         """
-        A wrapper around the graphgiz.Digraph.render
+        Saves the chart and renders it with graphviz, the same as graphviz.Digraph.render.  ``format`` may also be a
+        list of formats, in which case the layout is computed once and written out in every format.
         Args:
-            filename:
-            directory:
-            view:
-            cleanup:
-            format:
-            renderer:
-            formatter:
+            filename: Filename for the DOT source
+            directory: Directory for the source and the rendered output
+            view: Open the rendered result with the default application
+            cleanup: Delete the source file after rendering
+            format: The output format, or a list of formats (defaults to the graph's format)
+            renderer: The output renderer
+            formatter: The output formatter
 
-        Returns:
+        Returns: The path of the rendered file, or a list of paths (one per format) if a list of formats was given
 
         """
-        return self.graph.render(filename=filename, directory=directory, view=view, cleanup=cleanup, format=format,
-                                 renderer=renderer, formatter=formatter)
+        filepath = self.save(filename, directory)
+        if format is None:
+            format = self.graph.format
+        formats = [format] if isinstance(format, str) else list(format)
+        rendered = self._render_file(filepath, formats, renderer, formatter)
+        self._optimize_rendered(rendered, formats, renderer, formatter)
+        if cleanup:
+            os.remove(filepath)
+        if view:
+            self.graph._view(rendered[0], self.graph.format)
+        return rendered[0] if isinstance(format, str) else rendered
+
+    def _optimize_rendered(self, rendered: list, formats: list, renderer=None, formatter=None) -> None:
+        """
+        Shrinks the rendered SVG file in place if the chart has optimize_svg set.
+        Args:
+            rendered: The paths of the rendered files, one per format
+            formats: The rendered formats
+
+        Returns: None
+
+        """
+        if self.optimize_svg and 'svg' in formats and renderer is None and formatter is None:
+            path = rendered[formats.index('svg')]
+            with open(path, 'rb') as fd:
+                svg = self._optimize(fd.read())
+            with open(path, 'wb') as fd:
+                fd.write(svg)
+
+    def _render_file(self, filepath: str, formats: list, renderer=None, formatter=None) -> list:
+        """
+        Renders a saved DOT file into one or more formats, going through the render cache if the chart has one.
+        Only formats missing from the cache are rendered.
+        Args:
+            filepath: Path of the saved DOT source
+            formats: The output formats
+            renderer: The output renderer
+            formatter: The output formatter
+
+        Returns: The paths of the rendered files, one per format
+
+        """
+        rendered, missing = self._cached_renders(filepath, formats, renderer, formatter)
+        if missing:
+            formats = [format for format, _ in missing]
+            with self._phase('render', formats=formats):
+                paths = self.backend.render(self, filepath, formats, renderer, formatter)
+            self._store_renders(missing, paths)
+        return rendered
+
+    def _cached_renders(self, filepath: str, formats: list, renderer=None, formatter=None) -> tuple:
+        """
+        Writes out the formats of a saved DOT file that are already in the render cache.
+        Args:
+            filepath: Path of the saved DOT source
+            formats: The output formats
+            renderer: The output renderer
+            formatter: The output formatter
+
+        Returns: A (paths, missing) tuple: the paths of the rendered files, one per format, and a list of
+            (format, cache key) pairs still to be rendered
+
+        """
+        from graphviz import backend
+        engine = self.graph.engine
+        rendered = [backend.command(engine, format, filepath, renderer, formatter)[1] for format in formats]
+        if self.cache is None:
+            return rendered, [(format, None) for format in formats]
+
+        digest = self.cache.file_digest(filepath)
+        missing = []
+        for format, path in zip(formats, rendered):
+            key = self.cache.digest_key(digest, engine, format, renderer, formatter)
+            out = self._cache_lookup(key, format)
+            if out is None:
+                missing.append((format, key))
+            else:
+                with open(path, 'wb') as fd:
+                    fd.write(out)
+        return rendered, missing
 
-    def save(self, filename=None, directory=None):
+    def _store_renders(self, missing: list, paths: list) -> None:
         """
-        A wrapper around graphviz.Digraph.save
+        Adds freshly rendered files to the render cache.
         Args:
-            filename:
-            directory:
+            missing: The (format, cache key) pairs from _cached_renders
+            paths: The rendered paths, one per pair
 
-        Returns:
+        Returns: None
 
         """
-        return self.graph.save(filename=filename, directory=directory)
+        if self.cache is None:
+            return
+        for (_, key), path in zip(missing, paths):
+            with open(path, 'rb') as fd:
+                self.cache.put(key, fd.read())
+
+    async def pipe_async(self, format=None, renderer=None, formatter=None, timeout: float = None) -> bytes:
+        """
+        The asyncio version of pipe.  With the default backend graphviz runs in an asyncio subprocess, so the event
+        loop isn't blocked; the number of simultaneous graphviz processes is limited by
+        flowgiston.aio.set_max_concurrency.
+        Args:
+            format: The output format (defaults to the graph's format)
+            renderer: The output renderer
+            formatter: The output formatter
+            timeout: (Optional) seconds to wait for graphviz.  The process is killed if it takes longer, or if the
+                awaiting task is cancelled.
+
+        Returns: The rendered output as bytes
+
+        """
+        if format is None:
+            format = self.graph.format
+        if self.cache is None:
+            with self._phase('pipe', format=format):
+                return await self.backend.pipe_async(self, format, renderer, formatter, timeout=timeout)
+
+        data = self.source.encode(self.graph.encoding)
+        key = self.cache.key(data, self.graph.engine, format, renderer, formatter)
+        out = self._cache_lookup(key, format)
+        if out is None:
+            with self._phase('pipe', format=format):
+                out = await self.backend.pipe_async(self, format, renderer, formatter, data, timeout)
+            self.cache.put(key, out)
+        return out
+
+    async def render_async(self, filename=None, directory=None, cleanup=False, format=None, renderer=None,
+                           formatter=None, timeout: float = None):
+        """
+        The asyncio version of render.  Saving happens in the loop's default executor and, with the default backend,
+        graphviz runs in an asyncio subprocess, so the event loop isn't blocked.  The chart shouldn't be modified until rendering finishes.
+        Args:
+            filename: Filename for the DOT source
+            directory: Directory for the source and the rendered output
+            cleanup: Delete the source file after rendering
+            format: The output format, or a list of formats (defaults to the graph's format)
+            renderer: The output renderer
+            formatter: The output formatter
+            timeout: (Optional) seconds to wait for graphviz.  The process is killed if it takes longer, or if the
+                awaiting task is cancelled.
+
+        Returns: The path of the rendered file, or a list of paths (one per format) if a list of formats was given
+
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        filepath = await loop.run_in_executor(None, self.save, filename, directory)
+        if format is None:
+            format = self.graph.format
+        formats = [format] if isinstance(format, str) else list(format)
+
+        rendered, missing = await loop.run_in_executor(None, self._cached_renders, filepath, formats, renderer,
+                                                       formatter)
+        if missing:
+            formats = [format for format, _ in missing]
+            with self._phase('render', formats=formats):
+                paths = await self.backend.render_async(self, filepath, formats, renderer, formatter, timeout)
+            await loop.run_in_executor(None, self._store_renders, missing, paths)
+        await loop.run_in_executor(None, self._optimize_rendered, rendered, formats, renderer, formatter)
+        if cleanup:
+            os.remove(filepath)
+        return rendered[0] if isinstance(format, str) else rendered
+
+    def _iter_chunks(self, chunk_size: int = 64 * 1024):
+        """
+        Yields the DOT source in chunks of roughly ``chunk_size`` characters, each ending on a line boundary.
+        Args:
+            chunk_size: Approximate number of characters per chunk
+
+        Returns: generator of str
+
+        """
+        lines = []
+        size = 0
+        for line in self._iter_source():
+            lines.append(line)
+            size += len(line) + 1
+            if size >= chunk_size:
+                lines.append('')
+                yield '\n'.join(lines)
+                lines = []
+                size = 0
+        lines.append('')
+        yield '\n'.join(lines)
+
+    def write(self, fileobj, chunk_size: int = 64 * 1024) -> int:
+        """
+        Streams the DOT source to a file-like object in bounded chunks, so the full source is never held in memory.
+        Text files are written str, anything else is written bytes in the graph's encoding.
+        Args:
+            fileobj: A text or binary file-like object
+            chunk_size: Approximate number of characters written at a time
+
+        Returns: The number of characters of DOT source written (not bytes, for binary files)
+
+        """
+        chars = 0
+        if isinstance(fileobj, io.TextIOBase):
+            for chunk in self._iter_chunks(chunk_size):
+                fileobj.write(chunk)
+                chars += len(chunk)
+        else:
+            encoding = self.graph.encoding
+            for chunk in self._iter_chunks(chunk_size):
+                fileobj.write(chunk.encode(encoding))
+                chars += len(chunk)
+        return chars
+
+    def save(self, filename=None, directory=None, compress=False):
+        """
+        Writes the DOT source to a file, the same as graphviz.Digraph.save.  The source is streamed to the file, so
+        saving takes constant extra memory however big the chart is.
+        Args:
+            filename: Filename for the DOT source (defaults to the graph's filename)
+            directory: Directory to save to
+            compress: If True, the file is gzip compressed.  graphviz can't render compressed files.
+
+        Returns: The path of the saved file
+
+        """
+        if filename is not None:
+            self.graph.filename = filename
+        if directory is not None:
+            self.graph.directory = directory
+        filepath = self.graph.filepath
+        if os.path.dirname(filepath):
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        # opened binary, so write encodes in the graph's encoding and tell counts the (uncompressed) bytes written
+        if compress:
+            import gzip
+            fd = gzip.open(filepath, 'wb')
+        else:
+            fd = io.open(filepath, 'wb')
+        with self._phase('save', path=filepath) as data, fd:
+            self.write(fd)
+            data['bytes'] = fd.tell()
+        return filepath
+
+    @classmethod
+    def load(cls, path: str, flowgiston_base_klass=None, encoding: str = 'utf-8', **kwargs) -> 'FlowgistonChart':
+        """
+        Reads a saved chart back in, e.g. to add to an archived chart and render it again.  The file is parsed a line
+        at a time, so large files are loaded in constant extra memory.  Gzip compressed files (from
+        ``save(compress=True)``) are detected and read too.
+
+        Each node is given the most specific FlowgistonBase class whose style its own style contains, so nodes come
+        back as the classes they were created from as long as the same FlowgistonBase classes are passed in.
+        Args:
+            path: Path of the DOT file
+            flowgiston_base_klass: a class of type FlowgistonBase to map node styles onto
+            encoding: The file's encoding
+            **kwargs: Other keyword args for FlowgistonChart
+
+        Returns: A new FlowgistonChart
+
+        Raises:
+            ValueError: If the file uses DOT that flowgiston doesn't write, e.g. undirected graphs
+
+        """
+        from . import dot
+        chart = cls(flowgiston_base_klass, **kwargs)
+        with open(path, 'rb') as fd:
+            compressed = fd.read(2) == b'\x1f\x8b'
+        if compressed:
+            import gzip
+            fd = gzip.open(path, 'rt', encoding=encoding)
+        else:
+            fd = io.open(path, 'r', encoding=encoding)
+        with fd:
+            dot.read(chart, fd)
+        if chart._graph is not None:
+            chart._graph.encoding = encoding
+        return chart
 
 
 class FlowgistonNode:
-    def __init__(self, name: str, label: str, flowbase: 'FlowgistonBase'):
+    __slots__ = ('name', 'label', 'flowbase', 'index')
+
+    def __init__(self, name: str, label: str, flowbase: 'FlowgistonBase', index: int):
         """
 
         Args:
             name: A string to be used as the name for this node.  The name is only used internally.
             label: A label for this node
             flowbase: A class of type FlowgistonBase
+            index: The id of this node in the chart's node store
         """
         self.name = name
         self.label = label
         self.flowbase = flowbase
+        self.index = index
+
+    # handles are views onto the chart's node store, so two handles for the same node are equal.  Names are
+    # compared rather than ids, as nodes created in a buffer change ids when they're merged.
+    def __eq__(self, other):
+        if not isinstance(other, FlowgistonNode):
+            return NotImplemented
+        return self.name == other.name and self.flowbase.fchart is other.flowbase.fchart
+
+    def __hash__(self):
+        return hash((id(self.flowbase.fchart), self.name))
+
+    def __repr__(self):
+        return '<FlowgistonNode %s %r>' % (self.name, self.label)
 
     def edge(self, node: 'FlowgistonNode', label=None, **kwargs) -> 'FlowgistonNode':
         """
@@ -356,9 +1897,25 @@ class FlowgistonNode:
         Returns: The destination node
 
         """
-        self.flowbase.fchart.graph.edge(self.name, node.name, label=label, **kwargs)
+        chart = self.flowbase.fchart
+        chart._add_edge(self.index, chart._edge_end(node), label, kwargs)
         return node
 
+    def edges_to(self, nodes, labels=None, **kwargs) -> list:
+        """
+        Create an edge from this node to each of several nodes, in one batch
+        Args:
+            nodes: An iterable of destination nodes
+            labels: (Optional) a label for every edge, or a sequence of labels, one per destination
+            **kwargs: Keyword args for styling the edges
+
+        Returns: The destination nodes, as a list
+
+        """
+        nodes = list(nodes)
+        self.flowbase.fchart._connect([self] * len(nodes), nodes, labels, kwargs)
+        return nodes
+
     def yes(self, node: 'FlowgistonNode', **kwargs) -> 'FlowgistonNode':
         """
         Create an edge from this node to another node labeled 'yes'
@@ -0,0 +1,61 @@
+import itertools
+import os
+from collections import namedtuple
+
+RenderResult = namedtuple('RenderResult', ['index', 'chart', 'path', 'error'])
+
+
+def _render_one(index, chart, filename, directory, kwargs):
+    """
+    Renders one chart, capturing any exception instead of raising it.
+    Returns: RenderResult
+
+    """
+    try:
+        path = chart.render(filename=filename, directory=directory, **kwargs)
+    except Exception as e:
+        return RenderResult(index, chart, None, e)
+    return RenderResult(index, chart, path, None)
+
+
+def render_many(charts, format: str = None, directory: str = None, max_workers: int = None, filenames=None,
+                **kwargs):
+    """
+    Renders many charts concurrently, yielding a RenderResult for each one as it finishes.  Each chart is saved and
+    rendered in a worker thread; the layout itself runs in a separate graphviz process, so the charts are laid out
+    in parallel across all cores.  A chart that fails to render doesn't stop the batch: its result carries the
+    exception in ``error`` and a ``path`` of None.
+
+    Charts are taken from ``charts`` lazily, so it can be a generator producing far more charts than fit in memory.
+    Args:
+        charts: An iterable of FlowgistonChart
+        format: The output format, or list of formats, for every chart (defaults to each chart's own format)
+        directory: Directory for the sources and rendered output
+        max_workers: Number of charts rendered at once.  Defaults to the number of CPUs.
+        filenames: (Optional) an iterable of source filenames, one per chart.  Defaults to 'chart<index>.gv'.
+        **kwargs: Other keyword args passed to FlowgistonChart.render (e.g. cleanup, renderer)
+
+    Returns: generator of RenderResult, in order of completion
+
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if filenames is None:
+        filenames = ('chart%d.gv' % i for i in itertools.count())
+    kwargs['format'] = format
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for index, (chart, filename) in enumerate(zip(charts, filenames)):
+            pending.add(pool.submit(_render_one, index, chart, filename, directory, kwargs))
+            # keep a bounded number of charts in flight so a huge batch isn't all held at once
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
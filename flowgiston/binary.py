@@ -0,0 +1,304 @@
+"""
+A compact binary format for charts, for handing them between processes or pipeline stages much faster than through
+DOT text.
+
+A file is a fixed header, a JSON table of contents and a run of packed little-endian integer columns:
+
+    magic (8 bytes) | table of contents length (uint64) | table of contents (JSON) | columns, 8-byte aligned
+
+The table of contents holds the chart's small tables (node classes by name, interned styles, clusters and graph
+settings) and, for each column, its typecode, its offset from the first column and its length.  Node and edge labels
+are interned into one string table.  Node names aren't stored when they're the default counter names.
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from .base import FlowgistonChart
+
+MAGIC = b'FGCHART1'
+_HEADER = struct.Struct('<8sQ')
+# the chart attributes built from the file when they're first used
+_COLUMNS = ('_node_names', '_node_labels', '_node_kinds', '_node_styles', '_edge_tails', '_edge_heads', '_edge_labels',
+            '_edge_styles')
+
+
+def _aligned(size: int) -> int:
+    """
+    Rounds a size up to a multiple of 8 bytes.
+    Returns: int
+
+    """
+    return -(-size // 8) * 8
+
+
+def _narrow(values: array) -> array:
+    """
+    Returns the values in the smallest signed typecode that holds them all.
+    Returns: array
+
+    """
+    if not values:
+        return array('b')
+    low, high = min(values), max(values)
+    for typecode in 'bhi':
+        bits = array(typecode).itemsize * 8 - 1
+        if -(1 << bits) <= low and high < (1 << bits):
+            return array(typecode, values)
+    return array('q', values)
+
+
+def _intern_strings(values, strings: dict) -> array:
+    """
+    Returns the string table ids of some strings, adding new ones to the table.  None is id 0.
+    Returns: array
+
+    """
+    ids = array('l')
+    append = ids.append
+    get = strings.get
+    for value in values:
+        sid = get(value)
+        if sid is None:
+            sid = strings[value] = len(strings)
+        append(sid)
+    return ids
+
+
+def _string_columns(values) -> tuple:
+    """
+    Packs strings into an offsets column and a UTF-8 blob.
+    Returns: An (offsets, blob) tuple
+
+    """
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = array('q', [0])
+    total = 0
+    for data in encoded:
+        total += len(data)
+        offsets.append(total)
+    return offsets, array('B', b''.join(encoded))
+
+
+def dump(chart: 'FlowgistonChart', path: str) -> None:
+    """
+    Writes a chart to a file in the binary format.  DOT lines added straight to ``chart.graph.body`` are kept as they
+    are.
+    Args:
+        chart: A FlowgistonChart
+        path: Path of the file to write
+
+    Returns: None
+
+    """
+    chart._merge_buffers()
+    names = chart._node_names
+    count = len(names)
+    strings = {None: 0}
+    columns = {
+        'node_labels': _intern_strings(chart._node_labels, strings),
+        'node_kinds': chart._node_kinds,
+        'node_styles': chart._node_styles,
+        'edge_tails': chart._edge_tails,
+        'edge_heads': chart._edge_heads,
+        'edge_labels': _intern_strings(chart._edge_labels, strings),
+        'edge_styles': chart._edge_styles,
+    }
+    counter_names = chart.naming == 'counter' and names == list(map('n{}'.format, range(count)))
+    if not counter_names:
+        columns['names'], columns['names_blob'] = _string_columns(names)
+    # id 0 stands for None and isn't stored
+    columns['strings'], columns['strings_blob'] = _string_columns(list(strings)[1:])
+
+    clusters = []
+    for number, (label, members) in enumerate(chart._clusters):
+        columns['cluster_%d' % number] = array('l', members)
+        clusters.append(label)
+
+    base = chart.flowgiston_base_klass
+    toc = {
+        'nodes': count,
+        'edges': len(chart._edge_tails),
+        'counter_names': counter_names,
+        'kinds': [None if type(kind) is base else type(kind).__name__ for kind in chart._kinds],
+        'styles': [list(map(list, style)) for style in chart._styles],
+        'clusters': clusters,
+        'columns': {},
+    }
+    graph = chart._graph
+    if graph is not None:
+        toc['graph'] = {
+            'name': graph.name, 'comment': graph.comment, 'filename': graph.filename, 'directory': graph.directory,
+            'format': graph.format, 'engine': graph.engine, 'encoding': graph.encoding, 'strict': graph.strict,
+            'graph_attr': dict(graph.graph_attr), 'node_attr': dict(graph.node_attr),
+            'edge_attr': dict(graph.edge_attr), 'body': list(graph.body),
+        }
+
+    packed = []
+    for key, values in columns.items():
+        if values.typecode not in 'Bq':
+            values = _narrow(values)
+        if sys.byteorder != 'little' and values.itemsize > 1:
+            values = array(values.typecode, values)
+            values.byteswap()
+        packed.append((key, values))
+
+    position = 0
+    for key, values in packed:
+        toc['columns'][key] = [values.typecode, position, len(values)]
+        position += _aligned(len(values) * values.itemsize)
+    data = json.dumps(toc, separators=(',', ':')).encode('utf-8')
+    start = _aligned(_HEADER.size + len(data))
+
+    with open(path, 'wb') as fd:
+        fd.write(_HEADER.pack(MAGIC, len(data)))
+        fd.write(data)
+        fd.write(b'\0' * (start - _HEADER.size - len(data)))
+        for key, values in packed:
+            raw = values.tobytes()
+            fd.write(raw)
+            fd.write(b'\0' * (-len(raw) % 8))
+
+
+class _MappedChart:
+    """
+    The memory-mapped file behind a loaded chart, building the chart's columns from it on first use.  The file is
+    closed once every column has been built.
+    """
+
+    def __init__(self, mm: mmap.mmap, start: int, toc: dict, kind_map: list):
+        self.mm = mm
+        self.start = start
+        self.toc = toc
+        self.kind_map = kind_map
+        self.pending = set(_COLUMNS)
+        self._strings = None
+
+    def _raw(self, key: str) -> tuple:
+        """
+        Returns a packed column's typecode, length and bytes.
+        Returns: tuple
+
+        """
+        typecode, offset, length = self.toc['columns'][key]
+        offset += self.start
+        return typecode, length, self.mm[offset:offset + length * array(typecode).itemsize]
+
+    def _column(self, key: str, typecode: str = 'l') -> array:
+        """
+        Copies a packed integer column out of the file.
+        Returns: array of the given typecode
+
+        """
+        packed_typecode, _, data = self._raw(key)
+        if packed_typecode == 'q' and typecode == 'l' and array('l').itemsize == 8:
+            # the common case for wide columns on 64-bit platforms: a plain copy
+            packed_typecode = 'l'
+        values = array(packed_typecode)
+        values.frombytes(data)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values if packed_typecode == typecode else array(typecode, values)
+
+    def _string_list(self, key: str) -> list:
+        """
+        Decodes a packed string column.
+        Returns: list of str
+
+        """
+        offsets = self._column(key, 'q')
+        blob = self._raw(key + '_blob')[2]
+        return [blob[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+    def strings(self) -> list:
+        """
+        Returns the string table, with None at id 0.
+        Returns: list
+
+        """
+        if self._strings is None:
+            self._strings = [None] + self._string_list('strings')
+        return self._strings
+
+    def build(self, name: str):
+        """
+        Builds one of the chart's columns and closes the file if it was the last one.
+        Args:
+            name: The chart attribute, one of _COLUMNS
+
+        Returns: The column
+
+        """
+        if name == '_node_names':
+            if self.toc['counter_names']:
+                value = list(map('n{}'.format, range(self.toc['nodes'])))
+            else:
+                value = self._string_list('names')
+        elif name in ('_node_labels', '_edge_labels'):
+            value = list(map(self.strings().__getitem__, self._column(name[1:])))
+        elif name == '_node_kinds' and self.kind_map != list(range(len(self.kind_map))):
+            value = array('l', map(self.kind_map.__getitem__, self._column('node_kinds')))
+        else:
+            value = self._column(name[1:])
+        self.pending.discard(name)
+        if not self.pending:
+            self.mm.close()
+        return value
+
+
+def load(path: str, flowgiston_base_klass=None, **kwargs) -> 'FlowgistonChart':
+    """
+    Loads a chart written by dump.  The file is memory-mapped and only its table of contents is read up front: each
+    of the chart's node and edge columns is copied out of the file the first time it's used, and FlowgistonNode
+    handles are only made when asked for (e.g. with get_node).
+
+    Nodes are given the FlowgistonBase classes they were created from, looked up by class name among
+    ``flowgiston_base_klass`` and its subclasses.  Nodes of classes that can't be found get Generic.
+    Args:
+        path: Path of the file
+        flowgiston_base_klass: a class of type FlowgistonBase
+        **kwargs: Other keyword args for FlowgistonChart
+
+    Returns: A new FlowgistonChart
+
+    Raises:
+        ValueError: If the file isn't a chart written by dump
+
+    """
+    with open(path, 'rb') as fd:
+        mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, length = _HEADER.unpack(mm[:_HEADER.size])
+        if magic != MAGIC:
+            raise ValueError('%s is not a flowgiston chart file' % path)
+        toc = json.loads(mm[_HEADER.size:_HEADER.size + length].decode('utf-8'))
+    except (struct.error, ValueError):
+        mm.close()
+        raise ValueError('%s is not a flowgiston chart file' % path)
+
+    chart = FlowgistonChart(flowgiston_base_klass, **kwargs)
+    for style in toc['styles']:
+        chart._intern_style(dict(style))
+    kind_map = []
+    for name in toc['kinds']:
+        klass = None if name is None else chart._find_class(name)
+        kind_map.append(chart._kind_id(chart._kind_for_class(klass or chart.flowgiston_base_klass)))
+
+    graph = toc.get('graph')
+    if graph is not None:
+        from graphviz import Digraph
+        chart.graph = Digraph(**graph)
+
+    mapped = _MappedChart(mm, _aligned(_HEADER.size + length), toc, kind_map)
+    for number, label in enumerate(toc['clusters']):
+        chart._clusters.append((label, mapped._column('cluster_%d' % number)))
+    for name in _COLUMNS:
+        del chart.__dict__[name]
+    chart._mapped = mapped
+    if toc['counter_names']:
+        # the names are n0 to n<nodes - 1>, so new nodes can be numbered without building the names column
+        chart._counter = chart._counter_checked = toc['nodes']
+    chart.version += 1
+    return chart
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'disk_bytes'])
+
+
+class RenderCache:
+    """
+    A content-addressed cache of rendered graphviz output.  Entries are keyed by a hash of the DOT source together
+    with the engine, format, renderer and formatter used to render it, so an unchanged chart is never laid out twice.
+
+    Entries are held in memory in least-recently-used order.  If a directory is given, entries are also written to
+    disk there, so they survive between processes.  A single cache can be shared between any number of charts and
+    threads.
+    """
+
+    def __init__(self, maxsize: int = 128, directory: str = None, max_disk_bytes: int = 256 * 1024 * 1024):
+        """
+
+        Args:
+            maxsize: Maximum number of entries kept in memory
+            directory: (Optional) directory for the on-disk cache.  Created if it doesn't exist.
+            max_disk_bytes: Maximum total size of the files in the on-disk cache
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._disk = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(data: bytes, engine: str, format: str, renderer: str = None, formatter: str = None) -> str:
+        """
+        Returns the cache key for rendering some DOT source.
+        Args:
+            data: The encoded DOT source
+            engine: The layout engine
+            format: The output format
+            renderer: The output renderer
+            formatter: The output formatter
+
+        Returns: str
+
+        """
+        return RenderCache.digest_key(hashlib.sha256(data).digest(), engine, format, renderer, formatter)
+
+    @staticmethod
+    def digest_key(digest: bytes, engine: str, format: str, renderer: str = None, formatter: str = None) -> str:
+        """
+        Returns the cache key for rendering DOT source, given the sha256 digest of the source.  Lets one digest be
+        reused for several formats.
+        Args:
+            digest: The sha256 digest of the encoded DOT source
+            engine: The layout engine
+            format: The output format
+            renderer: The output renderer
+            formatter: The output formatter
+
+        Returns: str
+
+        """
+        h = hashlib.sha256(('%s\0%s\0%s\0%s\0' % (engine, format, renderer, formatter)).encode('ascii'))
+        h.update(digest)
+        return h.hexdigest()
+
+    @staticmethod
+    def file_digest(filepath: str, chunk_size: int = 1024 * 1024) -> bytes:
+        """
+        Returns the sha256 digest of a saved DOT file, read in chunks so large files aren't held in memory.
+        Args:
+            filepath: Path of the DOT source
+            chunk_size: Number of bytes read at a time
+
+        Returns: bytes
+
+        """
+        h = hashlib.sha256()
+        with open(filepath, 'rb') as fd:
+            for chunk in iter(lambda: fd.read(chunk_size), b''):
+                h.update(chunk)
+        return h.digest()
+
+    def _disk_index(self) -> OrderedDict:
+        """
+        Returns the index of on-disk entries (key -> size), oldest first, scanning the directory on first use.
+        Returns: OrderedDict
+
+        """
+        if self._disk is None:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith('.tmp')]
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            self._disk = OrderedDict((e.name, e.stat().st_size) for e in entries)
+            self._disk_bytes = sum(self._disk.values())
+        return self._disk
+
+    def get(self, key: str) -> bytes:
+        """
+        Looks up a rendered result, counting a hit or a miss.
+        Args:
+            key: A key from RenderCache.key
+
+        Returns: The cached bytes, or None
+
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+            if self.directory is not None and key in self._disk_index():
+                path = os.path.join(self.directory, key)
+                try:
+                    with open(path, 'rb') as fd:
+                        data = fd.read()
+                    os.utime(path)
+                except OSError:
+                    # removed from under us, e.g. by another process sharing the directory
+                    self._disk_bytes -= self._disk.pop(key)
+                else:
+                    self._disk.move_to_end(key)
+                    self._remember(key, data)
+                    self.hits += 1
+                    return data
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Stores a rendered result, evicting the least recently used entries if the cache is full.
+        Args:
+            key: A key from RenderCache.key
+            data: The rendered output
+
+        Returns: None
+
+        """
+        with self._lock:
+            self._remember(key, data)
+            if self.directory is None or len(data) > self.max_disk_bytes:
+                return
+
+            disk = self._disk_index()
+            path = os.path.join(self.directory, key)
+            tmp = '%s.%d.tmp' % (path, threading.get_ident())
+            with open(tmp, 'wb') as fd:
+                fd.write(data)
+            os.replace(tmp, path)
+            self._disk_bytes += len(data) - disk.pop(key, 0)
+            disk[key] = len(data)
+
+            while self._disk_bytes > self.max_disk_bytes:
+                old, size = disk.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except OSError:
+                    pass
+
+    def _remember(self, key: str, data: bytes) -> None:
+        """
+        Adds an entry to the in-memory LRU.  Callers must hold the lock.
+        """
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Returns hit/miss statistics, in the style of functools.lru_cache.
+        Returns: CacheInfo
+
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._memory), self._disk_bytes)
+
+    def clear(self) -> None:
+        """
+        Empties the cache, including the on-disk entries, and resets the statistics.
+        Returns: None
+
+        """
+        with self._lock:
+            self._memory.clear()
+            if self.directory is not None:
+                for key in self._disk_index():
+                    try:
+                        os.remove(os.path.join(self.directory, key))
+                    except OSError:
+                        pass
+                self._disk.clear()
+                self._disk_bytes = 0
+            self.hits = self.misses = 0
@@ -0,0 +1,34 @@
+import argparse
+import sys
+
+from .spec import compile_specs
+
+
+def main(argv=None) -> int:
+    """
+    The ``flowgiston`` command: compiles and renders spec files, or directories of them, in parallel, skipping specs
+    whose output is up to date.
+    Args:
+        argv: (Optional) the command line arguments.  Defaults to sys.argv[1:].
+
+    Returns: The exit status, 1 if any spec failed
+
+    """
+    parser = argparse.ArgumentParser(prog='flowgiston', description='Render flowchart specs (JSON, JSON Lines or YAML).')
+    parser.add_argument('specs', nargs='+', metavar='SPEC', help='spec files or directories of spec files')
+    parser.add_argument('-o', '--output', metavar='DIR', help="output directory (defaults to each spec's directory)")
+    parser.add_argument('-T', '--format', default='svg', help='output format (default: svg)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='number of specs rendered at once')
+    parser.add_argument('-f', '--force', action='store_true', help='render specs whose output is up to date')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only report failures')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for result in compile_specs(args.specs, directory=args.output, format=args.format, max_workers=args.jobs,
+                                force=args.force):
+        if result.error is not None:
+            failed += 1
+            print('%s: %s' % (result.spec, result.error), file=sys.stderr)
+        elif not args.quiet:
+            print('%s: %s' % (result.spec, 'up to date' if result.skipped else result.path))
+    return 1 if failed else 0
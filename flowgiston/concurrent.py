@@ -0,0 +1,133 @@
+from array import array
+from bisect import bisect_right
+from hashlib import blake2b
+
+# provisional node ids are negative: -1 - (slot << _SLOT_SHIFT | local id)
+_SLOT_SHIFT = 40
+
+
+def provisional_id(slot: int, local: int) -> int:
+    """
+    Returns the provisional id of a node in a buffer, as handed out before the buffer is merged.
+    Returns: int
+
+    """
+    return -1 - (slot << _SLOT_SHIFT | local)
+
+
+def split_id(index: int) -> tuple:
+    """
+    Splits a provisional id into its buffer slot and local id.
+    Returns: A (slot, local id) tuple
+
+    """
+    index = -1 - index
+    return index >> _SLOT_SHIFT, index & ((1 << _SLOT_SHIFT) - 1)
+
+
+class ChartBuffer:
+    """
+    The nodes and edges one thread has added to a chart, kept apart from the chart's store until they're merged into
+    it.  Only the thread the buffer is bound to appends to it, so this needs no locking; only adding a style or node
+    class the chart hasn't seen before takes the chart's lock.
+
+    Nodes get provisional (negative) ids, and names made from the buffer's name and a per-buffer counter, so the
+    same work gives the same names whichever thread runs first.
+    """
+
+    def __init__(self, chart: 'FlowgistonChart', name: str, slot: int):
+        self.chart = chart
+        self.name = name
+        self.slot = slot
+        # the thread the buffer is bound to, if any
+        self.thread = None
+
+        # rows not merged yet; the first has local id ``first``.  Local ids come from ``next_local`` rather than the
+        # length of the columns, which a merge shortens while the owning thread may be appending.
+        self.first = 0
+        self.next_local = 0
+        self.node_names = []
+        self.node_labels = []
+        self.node_kinds = array('l')
+        self.node_styles = array('l')
+        self.edge_tails = array('q')
+        self.edge_heads = array('q')
+        self.edge_labels = []
+        self.edge_styles = array('l')
+
+        # merged runs of nodes as (first local id, first chart id) pairs, in order
+        self.segment_starts = []
+        self.segment_offsets = []
+
+        self._style_ids = {}
+        self._kind_ids = {}
+        self._name_counts = {}
+
+    def new_name(self, kind: 'FlowgistonBase', label: str) -> str:
+        """
+        Returns the name for the buffer's next node, following the chart's naming scheme.
+        Returns: str
+
+        """
+        naming = self.chart.naming
+        if naming == 'counter':
+            return '%s.%d' % (self.name, self.next_local)
+        if naming == 'content':
+            key = '%s\0%s\0%s' % (self.name, type(kind).__name__, label)
+            seen = self._name_counts.get(key, 0)
+            self._name_counts[key] = seen + 1
+            return 'n_' + blake2b(('%s\0%d' % (key, seen)).encode('utf-8'), digest_size=8).hexdigest()
+        from uuid import uuid4
+        return 'n_' + uuid4().hex
+
+    def _style_id(self, style: dict) -> int:
+        key = tuple(sorted((k, v) for k, v in style.items() if v is not None))
+        style_id = self._style_ids.get(key)
+        if style_id is None:
+            with self.chart._buffer_lock:
+                style_id = self._style_ids[key] = self.chart._intern_style(style)
+        return style_id
+
+    def add_node(self, name: str, label: str, style: dict, kind: 'FlowgistonBase') -> int:
+        """
+        Adds a node to the buffer.
+        Returns: The node's provisional id
+
+        """
+        kind_id = self._kind_ids.get(kind)
+        if kind_id is None:
+            with self.chart._buffer_lock:
+                kind_id = self._kind_ids[kind] = self.chart._kind_id(kind)
+        local = self.next_local
+        self.next_local += 1
+        self.node_names.append(name)
+        self.node_labels.append(label)
+        self.node_kinds.append(kind_id)
+        # appended last: a row counts once its style is in
+        self.node_styles.append(self._style_id(style))
+        return provisional_id(self.slot, local)
+
+    def add_edge(self, tail: int, head: int, label: str, style: dict) -> None:
+        """
+        Adds an edge to the buffer.  Either end may be a provisional id from any buffer.
+        Returns: None
+
+        """
+        self.edge_tails.append(tail)
+        self.edge_heads.append(head)
+        self.edge_labels.append(label)
+        self.edge_styles.append(self._style_id(style))
+
+    def resolve(self, local: int) -> int:
+        """
+        Returns the chart id a merged node of this buffer was given.
+        Args:
+            local: The node's local id
+
+        Returns: int, or None if the node hasn't been merged
+
+        """
+        if local >= self.first:
+            return None
+        segment = bisect_right(self.segment_starts, local) - 1
+        return self.segment_offsets[segment] + local - self.segment_starts[segment]
@@ -0,0 +1,373 @@
+import re
+from array import array
+
+# one DOT token: a quoted string, an HTML string (up to three levels of nested brackets), an edge operator, a bare
+# identifier or numeral, punctuation, or any other character (e.g. the start of a string continued on the next line)
+_TOKEN = re.compile(r'''
+    "(?:[^"\\]|\\.)*"
+  | <(?:[^<>]|<(?:[^<>]|<[^<>]*>)*>)*>
+  | -> | --
+  | [^\W\d]\w*
+  | -?(?:\.\d+|\d+(?:\.\d*)?)
+  | \S
+''', re.VERBOSE)
+_PUNCTUATION = {'[', ']', '{', '}', '=', ';', ',', ':', '->', '--'}
+_KEYWORDS = {'strict', 'graph', 'digraph', 'subgraph', 'node', 'edge'}
+
+# the node and edge lines flowgiston writes, with the label (if any) first in the attribute list.  Matching these
+# whole lines with one regex each is much faster than tokenizing them.
+_ID = r'[^\W\d]\w*|-?(?:\.\d+|\d+(?:\.\d*)?)|"(?:[^"\\]|\\.)*"'
+_LABEL = r'(?: \[(?:label=(%s|<(?:[^<>]|<(?:[^<>]|<[^<>]*>)*>)*>) ?)?(.*)\])?\s*$' % _ID
+# attribute lists cached per read, so files with attributes unique to each node don't fill memory
+_CACHE_SIZE = 4096
+# node lines leave the second group empty
+_LINE = re.compile(r'\t+(%s)(?: -> (%s))?%s' % (_ID, _ID, _LABEL))
+
+
+def _value(token: str) -> str:
+    """
+    Returns the string a DOT ID token stands for: quoted strings are unquoted, HTML strings keep their brackets (as
+    graphviz.lang.quote expects them) and bare IDs are returned as they are.
+    Returns: str
+
+    """
+    if token[0] == '"':
+        return token[1:-1].replace('\\"', '"')
+    return token
+
+
+class _Scope:
+    """
+    A graph or subgraph being read: the node defaults set in it, and for clusters the label and member nodes.
+    """
+    __slots__ = ('name', 'defaults', 'key', 'styles', 'label', 'members')
+
+    def __init__(self, name, defaults):
+        self.name = name
+        self.set_defaults(defaults)
+        self.label = None
+        self.members = array('l') if name is not None and name.startswith('cluster') else None
+
+    def set_defaults(self, defaults: dict) -> None:
+        self.defaults = defaults
+        # hashable copy of the defaults, for caching the styles of nodes declared in this scope
+        self.key = tuple(sorted(defaults.items()))
+        # the style ids of the attribute lists seen on node lines in this scope
+        self.styles = {}
+
+
+class _KindMatcher:
+    """
+    Maps node styles back onto the FlowgistonBase classes of a chart: a node belongs to the class with the largest
+    style that the node's style contains, falling back to Generic.
+    """
+
+    def __init__(self, chart: 'FlowgistonChart'):
+        self.chart = chart
+        base = chart.flowgiston_base_klass
+        classes = [base]
+        for klass in classes:
+            classes.extend(klass.__subclasses__())
+        self.candidates = []
+        for klass in classes:
+            style = {(k, str(v)) for k, v in klass._class_style().items() if v is not None}
+            self.candidates.append((klass, style))
+        # most specific first; sorted() keeps breadth-first order between equally specific classes
+        self.candidates = sorted(self.candidates, key=lambda c: -len(c[1]))
+        self.kind_ids = {}
+
+    def kind_id(self, style_id: int) -> int:
+        """
+        Returns the chart's kind id for the nodes with an interned style.
+        Returns: int
+
+        """
+        kind_id = self.kind_ids.get(style_id)
+        if kind_id is None:
+            style = set(self.chart._styles[style_id])
+            klass = self.chart.flowgiston_base_klass
+            for candidate, candidate_style in self.candidates:
+                if candidate_style <= style:
+                    klass = candidate
+                    break
+            kind_id = self.kind_ids[style_id] = self.chart._kind_id(self.chart._kind_for_class(klass))
+        return kind_id
+
+
+def read(chart: 'FlowgistonChart', lines) -> None:
+    """
+    Reads DOT source into an empty chart.  Supports the DOT that flowgiston and graphviz.Digraph write: node, edge
+    and attribute statements, anonymous subgraphs setting node defaults, and cluster subgraphs.  Lines are read one at
+    a time, so memory use doesn't depend on the size of the source.
+    Args:
+        chart: An empty FlowgistonChart
+        lines: An iterable of lines of DOT source
+
+    Returns: None
+
+    Raises:
+        ValueError: On DOT outside the supported subset
+
+    """
+    names = chart._node_names
+    labels = chart._node_labels
+    node_kinds = chart._node_kinds
+    node_styles = chart._node_styles
+    edge_tails = chart._edge_tails
+    edge_heads = chart._edge_heads
+    edge_labels = chart._edge_labels
+    edge_styles = chart._edge_styles
+    intern = chart._intern_style
+    styles = chart._styles
+    matcher = _KindMatcher(chart)
+
+    index_of = {}
+    # attribute lists seen on node and edge lines -> attribute dicts, and edge attribute lists -> style ids
+    parsed = {}
+    edge_ids = {}
+    scopes = []
+    comments = []
+    graph_name = None
+    strict = started = False
+
+    def node_style(scope, attrs):
+        if scope.defaults:
+            merged = dict(scope.defaults)
+            merged.update(attrs)
+            return intern(merged)
+        return intern(attrs)
+
+    def node(scope, name, attrs):
+        index = index_of.get(name)
+        label = attrs.pop('label', None) if attrs else None
+        if index is None:
+            index = index_of[name] = len(names)
+            style_id = node_style(scope, attrs)
+            names.append(name)
+            labels.append(label)
+            node_styles.append(style_id)
+            node_kinds.append(matcher.kind_id(style_id))
+        elif attrs or label is not None:
+            # declared again, e.g. with a position: add to the node's attributes
+            if label is not None:
+                labels[index] = label
+            if attrs:
+                style = dict(styles[node_styles[index]])
+                style.update(attrs)
+                style_id = node_styles[index] = intern(style)
+                node_kinds[index] = matcher.kind_id(style_id)
+        if scope.members is not None:
+            scope.members.append(index)
+        return index
+
+    def attr_list(tokens, i, number):
+        attrs = {}
+        while i < len(tokens) and tokens[i] == '[':
+            i += 1
+            while tokens[i] != ']':
+                if tokens[i] in (',', ';'):
+                    i += 1
+                    continue
+                if tokens[i + 1] != '=':
+                    raise ValueError('line %d: expected an attribute assignment' % number)
+                attrs[_value(tokens[i])] = _value(tokens[i + 2])
+                i += 3
+            i += 1
+        return attrs, i
+
+    def endpoint(tokens, i):
+        name = _value(tokens[i])
+        i += 1
+        # ports aren't kept
+        while i < len(tokens) and tokens[i] == ':':
+            i += 2
+        return name, i
+
+    def parse_attrs(rest):
+        # the attribute list after the label on a node or edge line, or False if it isn't a plain attribute list
+        attrs = parsed.get(rest)
+        if attrs is None:
+            attrs = {}
+            if rest:
+                tokens = _TOKEN.findall('[%s]' % rest)
+                try:
+                    attrs, i = attr_list(tokens, 0, 0)
+                except (IndexError, ValueError):
+                    i = -1
+                if i != len(tokens) or 'label' in attrs:
+                    attrs = False
+            if len(parsed) < _CACHE_SIZE:
+                parsed[rest] = attrs
+        return attrs
+
+    def fast_node(scope, name, label, rest):
+        if name.lower() in _KEYWORDS:
+            return False
+        attrs = parse_attrs(rest)
+        if attrs is False:
+            return False
+        name = _value(name)
+        if label is not None:
+            label = _value(label)
+        if name in index_of:
+            attrs = dict(attrs)
+            if label is not None:
+                attrs['label'] = label
+            node(scope, name, attrs)
+            return True
+        style_id = scope.styles.get(rest)
+        if style_id is None:
+            style_id = node_style(scope, dict(attrs))
+            if len(scope.styles) < _CACHE_SIZE:
+                scope.styles[rest] = style_id
+        index = index_of[name] = len(names)
+        names.append(name)
+        labels.append(label)
+        node_styles.append(style_id)
+        node_kinds.append(matcher.kind_id(style_id))
+        if scope.members is not None:
+            scope.members.append(index)
+        return True
+
+    def fast_edge(scope, tail, head, label, rest):
+        style_id = edge_ids.get(rest)
+        if style_id is None:
+            attrs = parse_attrs(rest)
+            if attrs is False:
+                return False
+            style_id = intern(attrs)
+            if len(edge_ids) < _CACHE_SIZE:
+                edge_ids[rest] = style_id
+        tail = _value(tail)
+        head = _value(head)
+        edge_tails.append(index_of[tail] if tail in index_of else node(scope, tail, {}))
+        edge_heads.append(index_of[head] if head in index_of else node(scope, head, {}))
+        edge_labels.append(None if label is None else _value(label))
+        edge_styles.append(style_id)
+        return True
+
+    def statement(tokens, number):
+        nonlocal graph_name, strict, started
+        i = 0
+        try:
+            while i < len(tokens):
+                token = tokens[i]
+                lower = token.lower()
+                if token == ';':
+                    i += 1
+                elif token == '}':
+                    scope = scopes.pop()
+                    if scope.members is not None:
+                        chart._clusters.append((scope.label, scope.members))
+                    i += 1
+                elif not scopes:
+                    # the graph header: [strict] (graph|digraph) [name] {
+                    if started:
+                        raise ValueError('line %d: more than one graph' % number)
+                    started = True
+                    strict = lower == 'strict'
+                    if strict:
+                        i += 1
+                    if tokens[i].lower() != 'digraph':
+                        raise ValueError('line %d: only digraphs can be loaded' % number)
+                    i += 1
+                    if tokens[i] != '{':
+                        graph_name = _value(tokens[i])
+                        i += 1
+                    scopes.append(_Scope(None, {}))
+                    i += 1
+                elif lower == 'subgraph' or token == '{':
+                    name = None
+                    if lower == 'subgraph':
+                        i += 1
+                        if tokens[i] != '{':
+                            name = _value(tokens[i])
+                            i += 1
+                    scopes.append(_Scope(name, dict(scopes[-1].defaults)))
+                    i += 1
+                elif lower in ('graph', 'node', 'edge') and tokens[i + 1] == '[':
+                    attrs, i = attr_list(tokens, i + 1, number)
+                    scope = scopes[-1]
+                    if len(scopes) == 1:
+                        graph = chart.graph
+                        {'graph': graph.graph_attr, 'node': graph.node_attr, 'edge': graph.edge_attr}[lower].update(
+                            attrs)
+                    elif lower == 'node':
+                        defaults = dict(scope.defaults)
+                        defaults.update(attrs)
+                        scope.set_defaults(defaults)
+                    elif lower == 'graph' and 'label' in attrs:
+                        scope.label = attrs['label']
+                elif i + 1 < len(tokens) and tokens[i + 1] == '=':
+                    key, value = _value(token), _value(tokens[i + 2])
+                    if len(scopes) == 1:
+                        chart.graph.attr(**{key: value})
+                    elif key == 'label':
+                        scopes[-1].label = value
+                    i += 3
+                elif token in _PUNCTUATION or lower in _KEYWORDS:
+                    raise ValueError('line %d: unexpected %r' % (number, token))
+                else:
+                    scope = scopes[-1]
+                    ends = []
+                    name, i = endpoint(tokens, i)
+                    ends.append(name)
+                    while i < len(tokens) and tokens[i] in ('->', '--'):
+                        if tokens[i] == '--':
+                            raise ValueError('line %d: only digraphs can be loaded' % number)
+                        if tokens[i + 1] == '{' or tokens[i + 1].lower() == 'subgraph':
+                            raise ValueError('line %d: subgraphs as edge endpoints are not supported' % number)
+                        name, i = endpoint(tokens, i + 1)
+                        ends.append(name)
+                    attrs, i = attr_list(tokens, i, number)
+
+                    if len(ends) == 1:
+                        node(scope, ends[0], attrs)
+                        continue
+                    label = attrs.pop('label', None)
+                    style_id = intern(attrs)
+                    ids = [index_of[end] if end in index_of else node(scope, end, {}) for end in ends]
+                    for tail, head in zip(ids, ids[1:]):
+                        edge_tails.append(tail)
+                        edge_heads.append(head)
+                        edge_labels.append(label)
+                        edge_styles.append(style_id)
+        except IndexError:
+            raise ValueError('line %d: incomplete statement' % number)
+
+    match_line = _LINE.match
+    pending = None
+    for number, line in enumerate(lines, 1):
+        if pending is None:
+            if scopes:
+                m = match_line(line)
+                if m is not None:
+                    tail, head, label, rest = m.groups()
+                    if (fast_node(scopes[-1], tail, label, rest) if head is None else
+                            fast_edge(scopes[-1], tail, head, label, rest)):
+                        continue
+            stripped = line.strip()
+            if stripped.startswith(('//', '#')):
+                if not started:
+                    # graphviz.Digraph writes its comment above the graph
+                    comments.append(stripped[2:].lstrip() if stripped.startswith('//') else stripped[1:].lstrip())
+                continue
+        else:
+            line = pending + line
+        tokens = _TOKEN.findall(line)
+        if '"' in tokens or '<' in tokens:
+            # an unterminated string: wait for the rest of it
+            pending = line
+            continue
+        pending = None
+        statement(tokens, number)
+    if pending is not None:
+        raise ValueError('unterminated string at end of DOT source')
+
+    if not started or scopes:
+        raise ValueError('incomplete DOT source')
+    if graph_name is not None or strict or comments:
+        chart.graph.name = graph_name
+        chart.graph.strict = strict
+        chart.graph.comment = '\n'.join(comments) or None
+    chart.version += 1
@@ -0,0 +1,153 @@
+from array import array
+
+
+class AdjacencyIndex:
+    """
+    Forward and reverse adjacency lists for a chart's edges, by node id.  Each list holds edge ids, so edge labels
+    and styles can be looked up in the chart's edge store.
+
+    Nodes and edges are only ever appended to a chart, so the index is kept up to date incrementally: each sync only
+    indexes what was added since the last one, and adding edges to the chart costs nothing extra.
+    """
+
+    def __init__(self, chart: 'FlowgistonChart'):
+        self.chart = chart
+        self.out_edges = []
+        self.in_edges = []
+        # number of edges indexed so far
+        self.edges = 0
+
+    def sync(self) -> 'AdjacencyIndex':
+        """
+        Indexes the nodes and edges added to the chart since the last sync.
+        Returns: self
+
+        """
+        chart = self.chart
+        out_edges = self.out_edges
+        in_edges = self.in_edges
+        missing = len(chart._node_names) - len(out_edges)
+        if missing > 0:
+            out_edges.extend([] for _ in range(missing))
+            in_edges.extend([] for _ in range(missing))
+        tails = chart._edge_tails
+        heads = chart._edge_heads
+        for edge in range(self.edges, len(tails)):
+            out_edges[tails[edge]].append(edge)
+            in_edges[heads[edge]].append(edge)
+        self.edges = len(tails)
+        return self
+
+    def successors(self, index: int, label=False) -> list:
+        """
+        Returns the heads of a node's outgoing edges, in the order the edges were added.
+        Args:
+            index: A node id
+            label: If given, only edges with this label are followed (None for unlabelled edges)
+
+        Returns: list of node ids
+
+        """
+        heads = self.chart._edge_heads
+        if label is False:
+            return [heads[edge] for edge in self.out_edges[index]]
+        labels = self.chart._edge_labels
+        return [heads[edge] for edge in self.out_edges[index] if labels[edge] == label]
+
+    def predecessors(self, index: int, label=False) -> list:
+        """
+        Returns the tails of a node's incoming edges, in the order the edges were added.
+        Args:
+            index: A node id
+            label: If given, only edges with this label are followed (None for unlabelled edges)
+
+        Returns: list of node ids
+
+        """
+        tails = self.chart._edge_tails
+        if label is False:
+            return [tails[edge] for edge in self.in_edges[index]]
+        labels = self.chart._edge_labels
+        return [tails[edge] for edge in self.in_edges[index] if labels[edge] == label]
+
+    def reachable_from(self, indexes) -> set:
+        """
+        Returns the nodes reachable from any of the given nodes (including themselves), by breadth-first search.
+        Args:
+            indexes: An iterable of node ids
+
+        Returns: set of node ids
+
+        """
+        heads = self.chart._edge_heads
+        out_edges = self.out_edges
+        seen = set(indexes)
+        queue = list(seen)
+        for index in queue:
+            for edge in out_edges[index]:
+                head = heads[edge]
+                if head not in seen:
+                    seen.add(head)
+                    queue.append(head)
+        return seen
+
+    def strongly_connected(self) -> list:
+        """
+        Finds the strongly connected components with a cycle in them, with an iterative version of Tarjan's
+        algorithm.
+        Returns: A list of components, each a list of node ids.  A node only forms a component on its own if it has an
+            edge to itself.
+
+        """
+        heads = self.chart._edge_heads
+        out_edges = self.out_edges
+        count = len(out_edges)
+        order = array('l', [-1]) * count
+        low = array('l', [0]) * count
+        on_stack = bytearray(count)
+        stack = []
+        components = []
+        counter = 0
+
+        for root in range(count):
+            if order[root] != -1:
+                continue
+            # each frame is a node and the position of the next of its edges to follow
+            frames = [(root, 0)]
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            while frames:
+                node, position = frames[-1]
+                edges = out_edges[node]
+                if position < len(edges):
+                    frames[-1] = (node, position + 1)
+                    head = heads[edges[position]]
+                    if order[head] == -1:
+                        order[head] = low[head] = counter
+                        counter += 1
+                        stack.append(head)
+                        on_stack[head] = 1
+                        frames.append((head, 0))
+                    elif on_stack[head] and order[head] < low[node]:
+                        low[node] = order[head]
+                    continue
+
+                frames.pop()
+                if frames:
+                    parent = frames[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                if low[node] == order[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or any(heads[edge] == node for edge in edges):
+                        component.reverse()
+                        components.append(component)
+        return components
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Instrumentation:
+    """
+    Collects counters and timings from the charts it's attached to, and passes each recorded event on to any
+    registered hooks, e.g. to forward them to a metrics system.  One instance can be shared by many charts.
+
+    Events and the data passed with them:
+
+    - ``nodegen``: one node created through the per-node API (no hook call, only aggregated)
+    - ``construct_style``: the style merging part of ``nodegen`` (no hook call, only aggregated)
+    - ``edge``: one edge created through the per-node API (no hook call, only aggregated)
+    - ``add_nodes``/``add_edges``: a bulk insert, with ``count``
+    - ``source``: DOT source generated as a string, with ``bytes`` (its size in the graph's encoding)
+    - ``save``: DOT source written to a file, with ``bytes`` (uncompressed) and ``path``
+    - ``render``: a backend render, with ``formats`` and ``status`` (the exit status, 0 on success)
+    - ``pipe``: a backend pipe, with ``format`` and ``status``
+    - ``cache_hit``/``cache_miss``: a render cache lookup, with ``format``
+
+    Hooks are called as ``hook(event, seconds, data)``, on the thread that did the work.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(float)
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook) -> None:
+        """
+        Registers a callback for recorded events.
+        Args:
+            hook: A callable taking (event: str, seconds: float, data: dict)
+
+        Returns: None
+
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook) -> None:
+        """
+        Unregisters a callback added with add_hook.
+        Returns: None
+
+        """
+        self._hooks.remove(hook)
+
+    def count(self, event: str, n: int = 1) -> None:
+        """
+        Adds to a counter without timing anything or calling hooks.
+        Returns: None
+
+        """
+        with self._lock:
+            self.counters[event] += n
+
+    def record(self, event: str, seconds: float, notify: bool = True, **data) -> None:
+        """
+        Records one occurrence of an event that took ``seconds``.
+        Args:
+            event: The event name
+            seconds: How long it took
+            notify: If False, the event is only aggregated and hooks aren't called
+            **data: Details passed to the hooks.  Integer values are also added to ``<event>_<key>`` counters.
+
+        Returns: None
+
+        """
+        with self._lock:
+            self.counters[event] += 1
+            self.timings[event] += seconds
+            for key, value in data.items():
+                if isinstance(value, int) and key != 'status':
+                    self.counters['%s_%s' % (event, key)] += value
+            if data.get('status'):
+                self.counters[event + '_errors'] += 1
+        if notify:
+            for hook in self._hooks:
+                hook(event, seconds, data)
+
+    @contextmanager
+    def phase(self, event: str, **data):
+        """
+        Times a block and records it as ``event``.  The block may add to ``data`` through the yielded dict.  If the
+        block raises, the exception's ``returncode`` (or 1) is recorded as the ``status``.
+        Returns: A context manager yielding the event's data dict
+
+        """
+        start = time.perf_counter()
+        try:
+            yield data
+        except BaseException as e:
+            data['status'] = getattr(e, 'returncode', None) or 1
+            raise
+        else:
+            data.setdefault('status', 0)
+        finally:
+            self.record(event, time.perf_counter() - start, **data)
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of the counters and timings.
+        Returns: dict with 'counters' and 'timings' keys
+
+        """
+        with self._lock:
+            return {'counters': dict(self.counters), 'timings': dict(self.timings)}
+
+    def reset(self) -> None:
+        """
+        Zeroes every counter and timing.
+        Returns: None
+
+        """
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
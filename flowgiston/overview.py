@@ -0,0 +1,281 @@
+from array import array
+
+from .base import FlowgistonChart
+
+
+def _copy_chart(chart: 'FlowgistonChart') -> 'FlowgistonChart':
+    """
+    Returns an empty chart with the same node classes, graph settings and chart options.
+    Returns: FlowgistonChart
+
+    """
+    copy = FlowgistonChart(chart.flowgiston_base_klass, cache=chart.cache, group_styles=chart.group_styles,
+                           naming=chart.naming, backend=chart.backend, instrumentation=chart.instrumentation,
+                           unique_edges=chart.unique_edges, optimize_svg=chart.optimize_svg)
+    # nodes copied over keep their names, so 'content' names given later must carry on from the source chart's
+    copy._name_counts = dict(chart._name_counts)
+    if chart._graph is not None:
+        from graphviz import Digraph
+        graph = chart._graph
+        copy.graph = Digraph(graph_attr=graph.graph_attr, node_attr=graph.node_attr, edge_attr=graph.edge_attr,
+                             format=graph.format, engine=graph.engine, encoding=graph.encoding)
+    return copy
+
+
+class Overview:
+    """
+    A large chart split into groups of nodes, to be shown as a collapsed overview (one summary node per group) plus a
+    chart per group, each laid out separately.  Graphviz layout time grows faster than linearly with chart size, so a
+    few small layouts are much quicker than one large one.  Create one with FlowgistonChart.overview.
+    """
+
+    def __init__(self, chart: 'FlowgistonChart', by='kind'):
+        """
+
+        Args:
+            chart: The FlowgistonChart to split
+            by: How nodes are grouped: 'kind' (by FlowgistonBase subclass; Generic nodes aren't grouped), 'group' (by each node's graphviz ``group``
+                attribute, e.g. ``chart.process('Query', group='db')``), 'subflows' (by the clusters made with
+                ``stamp(..., cluster=True)``), 'components' (by connected component), or a function taking a
+                FlowgistonNode and returning its group's key.  Nodes without a group (a key of None) are shown as
+                they are.
+        """
+        self.source = chart
+        self.by = by
+        chart._merge_buffers()
+        # the group of each node, or -1, and the key and members of each group
+        self.group_of = array('l', [-1]) * len(chart._node_names)
+        self.keys = []
+        self.members = []
+        self._assign()
+        # groups of a single node aren't collapsed
+        for group, members in enumerate(self.members):
+            if len(members) == 1:
+                self.group_of[members[0]] = -1
+
+    def _keys(self):
+        """
+        Yields each node's group key.
+        Returns: generator
+
+        """
+        chart = self.source
+        by = self.by
+        if by == 'kind':
+            base = chart.flowgiston_base_klass
+            names = [None if type(kind) is base else type(kind).__name__ for kind in chart._kinds]
+            return map(names.__getitem__, chart._node_kinds)
+        if by == 'group':
+            groups = [dict(style).get('group') for style in chart._styles]
+            return map(groups.__getitem__, chart._node_styles)
+        if by == 'subflows':
+            keys = [None] * len(chart._node_names)
+            seen = set()
+            for number, (label, members) in enumerate(chart._clusters):
+                # stamps of one template usually share a label
+                key = 'sub-flow %d' % number if label is None else label
+                if key in seen:
+                    key = '%s (%d)' % (key, number)
+                seen.add(key)
+                for index in members:
+                    if keys[index] is None:
+                        keys[index] = key
+            return keys
+        if by == 'components':
+            return self._components()
+        if callable(by):
+            return (by(chart.get_node(index)) for index in range(len(chart._node_names)))
+        raise ValueError('unknown grouping: %r' % (by,))
+
+    def _components(self) -> list:
+        """
+        Numbers the chart's weakly connected components with a union-find, in order of their first node.
+        Returns: list of int, one per node
+
+        """
+        chart = self.source
+        parent = list(range(len(chart._node_names)))
+
+        def find(index):
+            root = index
+            while parent[root] != root:
+                root = parent[root]
+            while parent[index] != root:
+                parent[index], index = root, parent[index]
+            return root
+
+        for tail, head in zip(chart._edge_tails, chart._edge_heads):
+            a, b = find(tail), find(head)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+        return [find(index) for index in range(len(parent))]
+
+    def _assign(self) -> None:
+        """
+        Fills in group_of, keys and members.
+        """
+        numbers = {}
+        group_of = self.group_of
+        for index, key in enumerate(self._keys()):
+            if key is None:
+                continue
+            group = numbers.get(key)
+            if group is None:
+                group = numbers[key] = len(self.keys)
+                self.keys.append(key)
+                self.members.append(array('l'))
+            self.members[group].append(index)
+            group_of[index] = group
+        if self.by == 'components':
+            self.keys = list(range(len(self.keys)))
+
+    @property
+    def groups(self) -> dict:
+        """
+        The collapsed groups: group key -> node ids.  Groups of a single node aren't collapsed and aren't listed.
+        Returns: dict
+
+        """
+        return {key: members for key, members in zip(self.keys, self.members) if len(members) > 1}
+
+    def _filename(self, group: int) -> str:
+        return 'group%d.gv' % group
+
+    def _group(self, key) -> int:
+        """
+        Returns the number of a collapsed group.
+        Raises: KeyError if there's no collapsed group with that key
+        """
+        try:
+            group = self.keys.index(key)
+        except ValueError:
+            raise KeyError(key)
+        if len(self.members[group]) < 2:
+            raise KeyError(key)
+        return group
+
+    def collapsed(self, link_format: str = None) -> 'FlowgistonChart':
+        """
+        Builds the overview chart: every group becomes one summary node, styled like its first node and labelled with
+        the group key and size, and the edges between groups are merged into one edge per pair of groups (labelled
+        with the number of edges when there's more than one).
+        Args:
+            link_format: (Optional) the format the groups are rendered in.  If given, each summary node links (through
+                its ``href``) to its group's output, as written by render.
+
+        Returns: FlowgistonChart
+
+        """
+        chart = self.source
+        overview = _copy_chart(chart)
+        group_of = self.group_of
+        styles = chart._styles
+        # chart node id -> overview node id, and group -> overview node id
+        node_ids = array('l', [-1]) * len(group_of)
+        group_ids = {}
+        kinds = {}
+
+        for index, group in enumerate(group_of):
+            kind = chart._kinds[chart._node_kinds[index]]
+            if kind not in kinds:
+                kinds[kind] = overview._kind_for_class(type(kind))
+            kind = kinds[kind]
+            style = dict(styles[chart._node_styles[index]])
+            if group == -1:
+                node_ids[index] = overview._add_node(chart._node_names[index], chart._node_labels[index], style, kind)
+                continue
+            overview_id = group_ids.get(group)
+            if overview_id is None:
+                style['shape'] = 'box3d'
+                if link_format is not None:
+                    style['href'] = '%s.%s' % (self._filename(group), link_format)
+                label = '%s\n%d nodes' % (self.keys[group], len(self.members[group]))
+                overview_id = group_ids[group] = overview._add_node('group_%d' % group, label, style, kind)
+            node_ids[index] = overview_id
+
+        # overview (tail, head) -> [count, label, style id]
+        edges = {}
+        for tail, head, label, style_id in zip(chart._edge_tails, chart._edge_heads, chart._edge_labels,
+                                               chart._edge_styles):
+            if group_of[tail] != -1 and group_of[tail] == group_of[head]:
+                continue
+            tail, head = node_ids[tail], node_ids[head]
+            edge = edges.get((tail, head))
+            if edge is None:
+                edges[(tail, head)] = [1, label, style_id]
+            else:
+                edge[0] += 1
+        for (tail, head), (count, label, style_id) in edges.items():
+            if count > 1:
+                label = '%d edges' % count
+            overview._add_edge(tail, head, label, dict(styles[style_id]))
+        return overview
+
+    def expand(self, key) -> 'FlowgistonChart':
+        """
+        Builds the chart of one group: its nodes and the edges between them.
+        Args:
+            key: A group key, as in ``groups``
+
+        Returns: FlowgistonChart
+
+        """
+        return self._expand(self._group(key))
+
+    def _expand(self, group: int) -> 'FlowgistonChart':
+        chart = self.source
+        sub = _copy_chart(chart)
+        members = self.members[group]
+        node_ids = {}
+        kinds = {}
+        for index in members:
+            kind = chart._kinds[chart._node_kinds[index]]
+            if kind not in kinds:
+                kinds[kind] = sub._kind_for_class(type(kind))
+            kind = kinds[kind]
+            node_ids[index] = sub._add_node(chart._node_names[index], chart._node_labels[index],
+                                            dict(chart._styles[chart._node_styles[index]]), kind)
+
+        group_of = self.group_of
+        for tail, head, label, style_id in zip(chart._edge_tails, chart._edge_heads, chart._edge_labels,
+                                               chart._edge_styles):
+            if group_of[tail] == group and group_of[head] == group:
+                sub._add_edge(node_ids[tail], node_ids[head], label, dict(chart._styles[style_id]))
+        return sub
+
+    def render(self, directory: str = None, format: str = 'svg', keys=None, max_workers: int = None,
+               **kwargs) -> tuple:
+        """
+        Renders the overview and the groups' charts, all laid out in parallel.  The overview's summary nodes link to
+        the groups' outputs, so in SVG output they can be clicked through.
+        Args:
+            directory: Directory for the sources and rendered output
+            format: The output format
+            keys: (Optional) the keys of the groups to render.  Defaults to every group.
+            max_workers: Number of charts laid out at once.  Defaults to the number of CPUs.
+            **kwargs: Other keyword args passed to FlowgistonChart.render
+
+        Returns: A tuple of the overview's path and a dict of group key -> path
+
+        Raises:
+            Exception: The first error raised by rendering a chart, once every chart has finished
+
+        """
+        from .batch import render_many
+        if keys is None:
+            groups = [group for group, members in enumerate(self.members) if len(members) > 1]
+        else:
+            groups = [self._group(key) for key in keys]
+
+        charts = (self.collapsed(format) if group is None else self._expand(group) for group in [None] + groups)
+        filenames = ['overview.gv'] + [self._filename(group) for group in groups]
+        paths = {}
+        errors = []
+        for result in render_many(charts, format=format, directory=directory, max_workers=max_workers,
+                                  filenames=filenames, **kwargs):
+            if result.error is not None:
+                errors.append((result.index, result.error))
+            paths[result.index] = result.path
+        if errors:
+            raise min(errors, key=lambda error: error[0])[1]
+        return paths[0], {self.keys[group]: paths[number] for number, group in enumerate(groups, 1)}
@@ -0,0 +1,353 @@
+"""
+Builds charts from declarative decision specs, as JSON, JSON Lines or YAML.  A spec document looks like:
+
+    {
+        "graph": {"engine": "dot", "graph_attr": {"rankdir": "LR"}},
+        "kinds": {"Alert": {"fillcolor": "red"}},
+        "nodes": [
+            {"id": "start", "type": "start", "next": "check"},
+            {"id": "check", "type": "conditional", "label": "Over limit?", "yes": "alert", "no": "end"},
+            {"id": "alert", "kind": "Alert", "label": "Page on-call"},
+            {"id": "end", "type": "end"}
+        ],
+        "edges": [{"from": "alert", "to": "end", "style": "dashed"}]
+    }
+
+Node ``type`` is one of the FlowgistonBase node methods (start, end, process, conditional or node, the default) and
+``kind`` names a FlowgistonBase subclass, found among the chart's classes or declared under ``kinds``.  Any other
+node or edge keys are graphviz attributes.  ``yes``, ``no`` and ``next`` on a node add its outgoing 'Yes', 'No' and
+unlabelled edges.  Edges may also be written as ``[from, to]`` or ``[from, to, label]`` lists.
+
+In JSON Lines specs every line is one node (an object with ``id``), one edge (an object with ``from``, or a list) or
+a header (an object with ``graph`` and/or ``kinds``), so specs of any size are read a line at a time.
+"""
+import io
+import json
+import os
+from array import array
+from collections import namedtuple
+
+from .base import FlowgistonChart
+
+SpecResult = namedtuple('SpecResult', ['spec', 'path', 'error', 'skipped'])
+
+# spec files recognised by compile_specs, by extension
+SPEC_EXTENSIONS = ('.json', '.jsonl', '.yaml', '.yml')
+# node type -> shape, as set by the FlowgistonBase node methods
+_SHAPES = {'node': None, 'start': 'oval', 'end': 'oval', 'process': 'box', 'conditional': 'diamond', 'if': 'diamond'}
+_NODE_KEYS = ('id', 'label', 'kind', 'type', 'yes', 'no', 'next')
+_EDGE_KEYS = ('from', 'to', 'label')
+# number of nodes added in one add_nodes call
+_BATCH_SIZE = 4096
+
+
+def _attr(value) -> str:
+    """
+    Returns a spec value as a graphviz attribute value.
+    Returns: str
+
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class SpecBuilder:
+    """
+    Adds the nodes and edges of a spec to a chart through the bulk add_nodes and add_edges path.  Nodes are added in
+    batches, and edges once every node is in, so an edge may name a node that comes later in the spec.
+    """
+
+    def __init__(self, chart: 'FlowgistonChart'):
+        self.chart = chart
+        # spec node id -> chart node id
+        self.ids = {}
+        # spec kind name -> FlowgistonBase instance
+        self.kinds = {}
+        # the FlowgistonBase class the spec's own kinds derive from, made when the spec declares kinds
+        self._private_base = None
+        # the pending batch of nodes: spec ids, kinds, labels and styles
+        self._pending = ([], [], [], [])
+        # edges as spec ids
+        self._tails = []
+        self._heads = []
+        self._labels = []
+        self._styles = []
+
+    def header(self, spec: dict) -> None:
+        """
+        Applies a spec's graph settings and declares its kinds.  Must come before the nodes.
+        Returns: None
+
+        """
+        chart = self.chart
+        graph = spec.get('graph')
+        if graph is not None:
+            from graphviz import Digraph
+            chart.graph = Digraph(**graph)
+        for name, style in (spec.get('kinds') or {}).items():
+            # spec kinds derive from a base private to this chart, so they don't become subclasses of the caller's
+            # base that other charts would find by name
+            if self._private_base is None:
+                from .base import flowgiston_base
+                self._private_base = flowgiston_base(**chart.flowgiston_base_klass._class_style())
+            attrs = {}
+            parent = self._python_class(name)
+            if parent is not None:
+                attrs.update(parent._class_style())
+                if getattr(parent, 'label', None) is not None:
+                    attrs['label'] = parent.label
+            attrs.update((key, _attr(value)) for key, value in (style or {}).items())
+            self.kinds[name] = chart._kind_for_class(type(name, (self._private_base,), attrs))
+
+    def _python_class(self, name: str):
+        """
+        Finds a FlowgistonBase class by name among the chart's classes.
+        Returns: The class, or None
+
+        """
+        return self.chart._find_class(name)
+
+    def _kind(self, name: str) -> 'FlowgistonBase':
+        kind = self.kinds.get(name)
+        if kind is None:
+            klass = self._python_class(name)
+            if klass is None:
+                raise ValueError('unknown node kind: %r' % name)
+            kind = self.kinds[name] = self.chart._kind_for_class(klass)
+        return kind
+
+    def node(self, spec: dict) -> None:
+        """
+        Adds a node, and its yes, no and next edges.
+        Returns: None
+
+        """
+        try:
+            node_id = spec['id']
+        except KeyError:
+            raise ValueError('spec node without an id: %r' % (spec,))
+        kind = self._kind(spec.get('kind', 'Generic'))
+        node_type = spec.get('type', 'node')
+        if node_type not in _SHAPES:
+            raise ValueError('unknown node type: %r' % node_type)
+
+        style = {key: _attr(value) for key, value in spec.items() if key not in _NODE_KEYS}
+        shape = _SHAPES[node_type]
+        if shape is not None:
+            style.setdefault('shape', shape)
+        label = spec.get('label')
+        if label is None and getattr(kind, 'label', None) is None:
+            label = node_type.title() if node_type in ('start', 'end') else str(node_id)
+
+        ids, kinds, labels, styles = self._pending
+        ids.append(node_id)
+        kinds.append(kind)
+        labels.append(label)
+        styles.append(style)
+        if len(ids) >= _BATCH_SIZE:
+            self._flush()
+
+        for key, edge_label in (('yes', 'Yes'), ('no', 'No'), ('next', None)):
+            head = spec.get(key)
+            if head is not None:
+                self._edge(node_id, head, edge_label, {})
+
+    def _flush(self) -> None:
+        """
+        Adds the pending batch of nodes to the chart.
+        """
+        ids, kinds, labels, styles = self._pending
+        for node_id, chart_id in zip(ids, self.chart._add_nodes(labels, kinds, styles)):
+            if node_id in self.ids:
+                raise ValueError('duplicate node id: %r' % (node_id,))
+            self.ids[node_id] = chart_id
+        self._pending = ([], [], [], [])
+
+    def edge(self, spec) -> None:
+        """
+        Adds an edge, given as an object or a ``[from, to]`` or ``[from, to, label]`` list.
+        Returns: None
+
+        """
+        if isinstance(spec, dict):
+            try:
+                tail, head = spec['from'], spec['to']
+            except KeyError:
+                raise ValueError('spec edge without from and to: %r' % (spec,))
+            style = {key: _attr(value) for key, value in spec.items() if key not in _EDGE_KEYS}
+            self._edge(tail, head, spec.get('label'), style)
+        elif 2 <= len(spec) <= 3:
+            self._edge(spec[0], spec[1], spec[2] if len(spec) == 3 else None, {})
+        else:
+            raise ValueError('bad spec edge: %r' % (spec,))
+
+    def _edge(self, tail, head, label, style: dict) -> None:
+        self._tails.append(tail)
+        self._heads.append(head)
+        self._labels.append(None if label is None else str(label))
+        self._styles.append(style)
+
+    def finish(self) -> 'FlowgistonChart':
+        """
+        Adds the remaining nodes and all the edges.
+        Returns: The chart
+
+        Raises:
+            ValueError: If an edge names a node that isn't in the spec
+
+        """
+        if self._pending[0]:
+            self._flush()
+        ids = self.ids
+        try:
+            tails = array('l', map(ids.__getitem__, self._tails))
+            heads = array('l', map(ids.__getitem__, self._heads))
+        except KeyError as e:
+            raise ValueError('spec edge to unknown node %r' % e.args[0])
+        styles = self._styles
+        if not any(styles):
+            styles = None
+        self.chart._add_edges(tails, heads, self._labels, styles)
+        return self.chart
+
+
+def compile_spec(spec: dict, flowgiston_base_klass=None, **kwargs) -> 'FlowgistonChart':
+    """
+    Builds a chart from a spec document.
+    Args:
+        spec: The spec, as loaded from JSON or YAML
+        flowgiston_base_klass: a class of type FlowgistonBase whose subclasses the spec's kinds can name
+        **kwargs: Other keyword args for FlowgistonChart
+
+    Returns: A new FlowgistonChart
+
+    Raises:
+        ValueError: If the spec is malformed, e.g. an edge names an unknown node
+
+    """
+    builder = SpecBuilder(FlowgistonChart(flowgiston_base_klass, **kwargs))
+    builder.header(spec)
+    for node in spec.get('nodes') or ():
+        builder.node(node)
+    for edge in spec.get('edges') or ():
+        builder.edge(edge)
+    return builder.finish()
+
+
+def _read_lines(builder: 'SpecBuilder', fd) -> None:
+    """
+    Feeds a JSON Lines spec to a builder a line at a time.
+    """
+    for number, line in enumerate(fd, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError('line %d: %s' % (number, e))
+        if isinstance(record, list) or 'from' in record:
+            builder.edge(record)
+        elif 'id' in record:
+            builder.node(record)
+        else:
+            builder.header(record)
+
+
+def load_spec(path: str, flowgiston_base_klass=None, **kwargs) -> 'FlowgistonChart':
+    """
+    Builds a chart from a spec file: JSON (``.json``), JSON Lines (``.jsonl``, read a line at a time) or YAML
+    (``.yaml``/``.yml``, which needs PyYAML).
+    Args:
+        path: Path of the spec
+        flowgiston_base_klass: a class of type FlowgistonBase whose subclasses the spec's kinds can name
+        **kwargs: Other keyword args for FlowgistonChart
+
+    Returns: A new FlowgistonChart
+
+    Raises:
+        ValueError: If the spec is malformed
+
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with io.open(path, 'r', encoding='utf-8') as fd:
+        if extension == '.jsonl':
+            builder = SpecBuilder(FlowgistonChart(flowgiston_base_klass, **kwargs))
+            _read_lines(builder, fd)
+            return builder.finish()
+        if extension in ('.yaml', '.yml'):
+            import yaml
+            spec = yaml.load(fd, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        else:
+            spec = json.load(fd)
+    return compile_spec(spec, flowgiston_base_klass, **kwargs)
+
+
+def _find_specs(paths) -> list:
+    """
+    Expands directories into the spec files in them.
+    Returns: list of paths
+
+    """
+    specs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.splitext(name)[1].lower() in SPEC_EXTENSIONS:
+                    specs.append(os.path.join(path, name))
+        else:
+            specs.append(path)
+    return specs
+
+
+class _SpecJob:
+    """
+    A spec waiting to be compiled and rendered by render_many, so the spec is only read in the worker rendering it
+    and a bad spec is reported like a failed render.
+    """
+
+    def __init__(self, path: str, kwargs: dict):
+        self.path = path
+        self.kwargs = kwargs
+
+    def render(self, **kwargs) -> str:
+        return load_spec(self.path, **self.kwargs).render(**kwargs)
+
+
+def compile_specs(paths, directory: str = None, format: str = 'svg', max_workers: int = None, force: bool = False,
+                  flowgiston_base_klass=None, **kwargs):
+    """
+    Compiles and renders spec files in parallel, yielding a SpecResult for each as it finishes.  A spec is skipped if
+    its output is newer than the spec, unless ``force`` is set.  Specs that fail to load or render don't stop the
+    batch: their result carries the exception in ``error``.
+    Args:
+        paths: An iterable of spec files and directories of spec files
+        directory: Directory for the output, named after each spec (e.g. ``checkout.gv.svg`` for
+            ``checkout.json``).  Defaults to each spec's own directory.
+        format: The output format
+        max_workers: Number of specs rendered at once.  Defaults to the number of CPUs.
+        force: If True, specs are rendered even if their output is up to date
+        flowgiston_base_klass: a class of type FlowgistonBase whose subclasses the specs' kinds can name
+        **kwargs: Other keyword args for FlowgistonChart (e.g. backend or cache)
+
+    Returns: generator of SpecResult, skipped specs first and the rest in order of completion
+
+    """
+    from .batch import render_many
+    jobs = []
+    filenames = []
+    for spec in _find_specs(paths):
+        stem = os.path.splitext(os.path.basename(spec))[0]
+        filename = stem + '.gv'
+        output = os.path.join(directory or os.path.dirname(spec), '%s.%s' % (filename, format))
+        if not force and os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(spec):
+            yield SpecResult(spec, output, None, True)
+            continue
+        kwargs['flowgiston_base_klass'] = flowgiston_base_klass
+        jobs.append(_SpecJob(spec, dict(kwargs)))
+        filenames.append(os.path.join(os.path.dirname(spec), filename) if directory is None else filename)
+
+    for result in render_many(jobs, format=format, directory=directory, max_workers=max_workers,
+                              filenames=filenames):
+        yield SpecResult(result.chart.path, result.path, result.error, False)
@@ -0,0 +1,170 @@
+"""
+Shrinks the SVG Graphviz writes, for sending large charts to a browser.  Graphviz repeats every style attribute on
+every shape and text element and wraps each node and edge in a comment and a ``<title>`` holding its DOT name, so most
+of a large chart's SVG is boilerplate.  ``optimize`` strips the comments, titles and whitespace, moves the style
+attributes into one CSS class per distinct style, named after the FlowgistonBase class of the node (e.g.
+``Alert-polygon``), and shortens element ids.  Node groups also get their class's name as a CSS class, so a page can
+restyle every node of a class.
+"""
+import re
+from html import unescape
+
+# attributes moved into CSS
+_PRESENTATION = ('fill', 'stroke', 'stroke-width', 'stroke-dasharray', 'stroke-opacity', 'fill-opacity',
+                 'font-family', 'font-size', 'font-weight', 'font-style', 'text-anchor', 'text-decoration')
+# Graphviz puts every element on a line of its own: the newlines are skipped with the token after them
+_TOKEN = re.compile(r'\n*(<!--.*?-->|<!DOCTYPE[^>]*>|<[^>]*>|[^<\n][^<]*)', re.S)
+_TAG = re.compile(r'<(/?)([\w:]+)(.*?)(/?)>$', re.S)
+_ATTR = re.compile(r'([\w:-]+)="([^"]*)"')
+_URL = re.compile(r'url\(#([^)]+)\)')
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+_NOT_CSS = re.compile(r'[^A-Za-z0-9_-]')
+
+
+def _short_id(number: int, prefix: str) -> str:
+    """
+    Returns a short id: a letter followed by the number in base 36.
+    Returns: str
+
+    """
+    digits = ''
+    while True:
+        number, digit = divmod(number, 36)
+        digits = _DIGITS[digit] + digits
+        if not number:
+            return prefix + digits
+
+
+def _css_name(name: str) -> str:
+    """
+    Returns a name made into a valid CSS identifier, e.g. 'On Call' -> 'On_Call' and '2fa' -> '_2fa'.
+    Returns: str
+
+    """
+    name = _NOT_CSS.sub('_', name)
+    if not name or name[0].isdigit() or name[:2] == '--' or (name[0] == '-' and name[1:2].isdigit()):
+        name = '_' + name
+    return name
+
+
+def _css_value(name: str, value: str) -> str:
+    """
+    Returns a presentation attribute's value as a CSS value: font sizes need a unit in CSS.
+    Returns: str
+
+    """
+    if name == 'font-size' and value[-1:].isdigit():
+        return value + 'px'
+    return value
+
+
+def _attrs(attrs) -> str:
+    return ''.join(' %s="%s"' % item for item in attrs)
+
+
+def optimize(svg: bytes, kinds: dict = None, keep_ids: bool = False) -> bytes:
+    """
+    Shrinks SVG written by Graphviz without changing how it looks.
+    Args:
+        svg: The SVG, as written by Graphviz
+        kinds: (Optional) node name -> CSS class name, e.g. the name of the node's FlowgistonBase class.  Nodes
+            missing from it are styled as 'node'.  Characters CSS doesn't allow in a class name become '_'.
+        keep_ids: If True, element ids are left as they are
+
+    Returns: The optimized SVG as bytes
+
+    """
+    text = svg.decode('utf-8')
+    kinds = kinds or {}
+    out = []
+    # style rules as (role, tag, attributes) -> class name, and the classes each role has used
+    rules = {}
+    role_counts = {}
+    ids = {}
+    css_names = {}
+    # open <g> elements as [role, position of the tag in out, attributes]
+    groups = []
+    style_at = None
+    in_title = False
+
+    def short(old):
+        new = ids.get(old)
+        if new is None:
+            new = ids[old] = _short_id(len(ids), old[0] if old[:1].isalpha() else 'i')
+        return new
+
+    def relink(key, value):
+        # only links and url() references name ids: a bare '#' value elsewhere is a colour
+        if key in ('href', 'xlink:href') and value.startswith('#'):
+            return '#' + short(value[1:])
+        return _URL.sub(lambda m: 'url(#%s)' % short(m.group(1)), value)
+
+    for token in _TOKEN.findall(text):
+        if token[0] != '<':
+            if in_title:
+                if groups and groups[-1][0] == 'node':
+                    kind = kinds.get(unescape(token), 'node')
+                    kind = css_names.get(kind) or css_names.setdefault(kind, _css_name(kind))
+                    groups[-1][0] = kind
+                    if kind != 'node':
+                        position, attrs = groups[-1][1], groups[-1][2]
+                        attrs = [(k, '%s %s' % (v, kind) if k == 'class' else v) for k, v in attrs]
+                        out[position] = '<g%s>' % _attrs(attrs)
+            elif '\n' not in token or not token.isspace():
+                out.append(token)
+            continue
+        if token.startswith('<!') or token.startswith('<?'):
+            if token.startswith('<?'):
+                out.append(token)
+            continue
+
+        closing, tag, body, empty = _TAG.match(token).groups()
+        if tag == 'title':
+            in_title = not closing
+            continue
+        if closing:
+            if tag == 'g' and groups:
+                groups.pop()
+            out.append(token)
+            continue
+
+        attrs = _ATTR.findall(body)
+        if not keep_ids:
+            attrs = [(k, short(v) if k == 'id' else relink(k, v) if '#' in v else v) for k, v in attrs]
+
+        if tag == 'g':
+            # the unclassed groups wrapping links inherit their parent's role
+            role = dict(attrs).get('class') or (groups[-1][0] if groups else 'svg')
+            groups.append([role, len(out), attrs])
+            out.append('<g%s%s>' % (_attrs(attrs), empty))
+            if empty:
+                groups.pop()
+            continue
+        if tag == 'svg':
+            out.append('<svg%s>' % _attrs(attrs))
+            style_at = len(out)
+            out.append('')
+            continue
+
+        style = tuple((k, v) for k, v in attrs if k in _PRESENTATION)
+        if style:
+            role = groups[-1][0] if groups else 'svg'
+            key = (role, tag, style)
+            name = rules.get(key)
+            if name is None:
+                count = role_counts[(role, tag)] = role_counts.get((role, tag), 0) + 1
+                name = '%s-%s' % (role, tag) if count == 1 else '%s-%s-%d' % (role, tag, count)
+                rules[key] = name
+            attrs = [(k, v) for k, v in attrs if k not in _PRESENTATION]
+            attrs.append(('class', name))
+        out.append('<%s%s%s>' % (tag, _attrs(attrs), empty))
+
+    if rules:
+        css = ''.join('.%s{%s}' % (name, ';'.join('%s:%s' % (k, _css_value(k, v)) for k, v in style))
+                      for (_, _, style), name in rules.items())
+        style_element = '<style>%s</style>' % css
+        if style_at is None:
+            out.insert(0, style_element)
+        else:
+            out[style_at] = style_element
+    return ''.join(out).encode('utf-8')
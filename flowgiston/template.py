@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+from .base import FlowgistonChart
+
+SubflowInstance = namedtuple('SubflowInstance', ['nodes', 'entry', 'exits'])
+
+
+class SubflowTemplate(FlowgistonChart):
+    """
+    A reusable sub-flow, built once and stamped into charts any number of times with FlowgistonChart.stamp.
+
+    Build a template like any chart, then mark its ports: ``entry`` is the node other nodes lead into, and ``exits``
+    maps names to the nodes leading out.  Each stamp returns the matching nodes in the target chart, ready to be
+    wired up:
+
+        retry = SubflowTemplate(Base, name='Retry')
+        check = retry.if_('Sensor OK?')
+        retry.entry = check
+        retry.exits['ok'] = check.yes(retry.process('Continue'))
+        retry.exits['escalate'] = check.no(retry.Alert.node('Escalate'))
+
+        block = chart.stamp(retry, cluster=True)
+        start.edge(block.entry)
+    """
+
+    def __init__(self, flowgiston_base_klass=None, name: str = 'subflow', **kwargs):
+        """
+
+        Args:
+            flowgiston_base_klass: a class of type FlowgistonBase
+            name: The template's name, used as the default cluster label and in stamped node names
+            **kwargs: Other keyword args for FlowgistonChart
+        """
+        super().__init__(flowgiston_base_klass, **kwargs)
+        self.name = name
+        self.entry = None
+        self.exits = {}
@@ -1,6 +1,4 @@
-from distutils.core import setup
-
-from setuptools import find_packages
+from setuptools import setup, find_packages
 
 setup(
     name='Flowgiston',
@@ -13,5 +11,7 @@ setup(
     maintainer="Matthew P. Gordon",
     maintainer_email="matt@kairosaerospace.com",
     install_requires=['graphviz==0.10.1'],
+    extras_require={'pygraphviz': ['pygraphviz'], 'yaml': ['pyyaml']},
+    entry_points={'console_scripts': ['flowgiston = flowgiston.cli:main']},
     tests_require=['pydot==1.4.1'],
 )
@@ -0,0 +1,42 @@
+from unittest import TestCase, skipIf
+from flowgiston import *
+from flowgiston import aio
+from graphviz import ExecutableNotFound
+import asyncio
+import os
+import sys
+import time
+
+
+class TestAsync(TestCase):
+    def test_pipe_async(self):
+        f = FlowgistonChart()
+        f.process("N1")
+
+        async def pipe():
+            return await f.pipe_async(format='svg')
+
+        try:
+            out = asyncio.run(pipe())
+        except ExecutableNotFound:
+            self.skipTest('graphviz is not installed')
+        self.assertIn(b'<svg', out)
+
+    @skipIf(sys.platform == 'win32', 'uses sleep')
+    def test_timeout_and_limit(self):
+        aio.set_max_concurrency(2)
+
+        async def sleeps():
+            start = time.monotonic()
+            await asyncio.gather(*(aio.run(['sleep', '0.2']) for _ in range(4)))
+            elapsed = time.monotonic() - start
+
+            with self.assertRaises(asyncio.TimeoutError):
+                await aio.run(['sleep', '5'], timeout=0.1)
+            return elapsed
+
+        try:
+            # four processes, two at a time
+            self.assertGreaterEqual(asyncio.run(sleeps()), 0.4)
+        finally:
+            aio.set_max_concurrency(os.cpu_count() or 1)
@@ -0,0 +1,26 @@
+from unittest import TestCase, mock
+from flowgiston import *
+from helpers import fake_run
+from tempfile import TemporaryDirectory
+import os
+
+
+class TestRenderMany(TestCase):
+    def test_render_many(self):
+        charts = []
+        for label in ['a', 'b', 'fail', 'c']:
+            f = FlowgistonChart()
+            f.process(label)
+            charts.append(f)
+
+        with TemporaryDirectory() as td, mock.patch('graphviz.backend.run', side_effect=fake_run):
+            results = sorted(render_many(iter(charts), format='svg', directory=td, max_workers=2))
+
+            self.assertEqual([r.index for r in results], [0, 1, 2, 3])
+            self.assertIsInstance(results[2].error, RuntimeError)
+            self.assertIsNone(results[2].path)
+            for r in results[:2] + results[3:]:
+                self.assertIsNone(r.error)
+                self.assertIs(r.chart, charts[r.index])
+                self.assertEqual(r.path, os.path.join(td, 'chart%d.gv.svg' % r.index))
+                self.assertTrue(os.path.exists(r.path))
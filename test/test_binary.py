@@ -0,0 +1,50 @@
+from unittest import TestCase
+from flowgiston import *
+from flowgiston import binary
+from tempfile import TemporaryDirectory
+import os
+
+
+class TestBinary(TestCase):
+    def build(self, **kwargs):
+        Base = flowgiston_base()
+
+        class Stop(Base):
+            fillcolor = 'red'
+
+        f = FlowgistonChart(Base, **kwargs)
+        f.graph.attr(rankdir='LR')
+        n1 = f.start('Start')
+        check = n1.edge(f.if_('Ready?'))
+        check.yes(f.Stop.node('Halt'), color='blue')
+        ids = f.add_nodes(['Step %d' % i for i in range(1000)], styles={'fillcolor': 'grey'})
+        f.add_edges(ids[:-1], ids[1:])
+        retry = SubflowTemplate(Base, name='Retry')
+        retry.entry = retry.process('Try')
+        f.stamp(retry, cluster=True)
+        return Base, f
+
+    def test_round_trip(self):
+        for naming in ('counter', 'content'):
+            Base, f = self.build(naming=naming)
+            with TemporaryDirectory() as td:
+                path = os.path.join(td, 'chart.fgc')
+                binary.dump(f, path)
+                g = binary.load(path, Base)
+                # nothing is built until it's used
+                self.assertNotIn('_node_labels', g.__dict__)
+                self.assertEqual(g.source, f.source)
+                self.assertIs(g.get_node(2).flowbase, g.Stop)
+                self.assertEqual(g.get_node(1).label, 'Ready?')
+
+                # loaded charts can be added to
+                g.get_node(2).edge(g.end('End'))
+                self.assertEqual(len(g._node_names), len(f._node_names) + 1)
+                self.assertLess(os.path.getsize(path), len(f.source))
+
+    def test_not_a_chart(self):
+        with TemporaryDirectory() as td:
+            path = os.path.join(td, 'chart.gv')
+            FlowgistonChart().save(path)
+            with self.assertRaises(ValueError):
+                binary.load(path)
@@ -0,0 +1,50 @@
+from unittest import TestCase, mock
+from flowgiston import *
+from tempfile import TemporaryDirectory
+import os
+
+
+class TestRenderCache(TestCase):
+    def test_lru(self):
+        cache = RenderCache(maxsize=2)
+        keys = [cache.key(b'digraph {}', 'dot', fmt) for fmt in ('svg', 'png', 'pdf')]
+        self.assertEqual(len(set(keys)), 3)
+
+        cache.put(keys[0], b'0')
+        cache.put(keys[1], b'1')
+        self.assertEqual(cache.get(keys[0]), b'0')
+        cache.put(keys[2], b'2')
+
+        # keys[1] was the least recently used
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.get(keys[2]), b'2')
+        info = cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 1, 2))
+
+    def test_disk(self):
+        with TemporaryDirectory() as td:
+            cache = RenderCache(directory=td, max_disk_bytes=10)
+            cache.put('a', b'aaaa')
+            cache.put('b', b'bbbb')
+            cache.put('c', b'cccc')
+            self.assertEqual(sorted(os.listdir(td)), ['b', 'c'])
+
+            # a fresh cache on the same directory sees the stored entries
+            cache = RenderCache(directory=td)
+            self.assertEqual(cache.get('c'), b'cccc')
+            self.assertIsNone(cache.get('a'))
+            cache.clear()
+            self.assertEqual(os.listdir(td), [])
+
+    def test_chart_pipe(self):
+        f = FlowgistonChart(cache=RenderCache())
+        f.process("N1").edge(f.process("N2"))
+        with mock.patch('graphviz.backend.pipe', return_value=b'<svg/>') as pipe:
+            self.assertEqual(f._repr_svg_(), '<svg/>')
+            self.assertEqual(f.pipe(format='svg'), b'<svg/>')
+            self.assertEqual(pipe.call_count, 1)
+
+            f.process("N3")
+            f.pipe(format='svg')
+            self.assertEqual(pipe.call_count, 2)
+        self.assertEqual(f.cache.cache_info().hits, 1)
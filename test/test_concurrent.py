@@ -0,0 +1,180 @@
+from unittest import TestCase
+from flowgiston import *
+import sys
+import threading
+import time
+from array import array
+import pydot
+
+
+class TestConcurrent(TestCase):
+    def build(self, order, group_styles=False):
+        Base = flowgiston_base()
+
+        class Stop(Base):
+            fillcolor = 'red'
+
+            def __init__(self, fchart):
+                # a slow class makes threads resolving it at the same time overlap
+                time.sleep(0.01)
+                super().__init__(fchart)
+
+        f = FlowgistonChart(Base, group_styles=group_styles)
+        start = f.start('Start')
+        handles = {}
+        started = {name: threading.Event() for name in order}
+        barrier = threading.Barrier(len(order))
+
+        def worker(name, wait_for):
+            # every thread uses Stop for the first time at once
+            barrier.wait()
+            stop = f.Stop
+            if wait_for is not None:
+                started[wait_for].wait()
+            with f.buffer(name):
+                prev = start
+                for i in range(50):
+                    prev = prev.edge(f.process('%s %d' % (name, i)))
+                handles[name] = prev.edge(stop.node('%s done' % name))
+                started[name].set()
+
+        # run the buffers one after the other, in the given order
+        threads = []
+        previous = None
+        for name in order:
+            threads.append(threading.Thread(target=worker, args=(name, previous)))
+            previous = name
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return f, handles
+
+    def test_deterministic(self):
+        f, handles = self.build(['net', 'disk', 'cpu'])
+        g, _ = self.build(['cpu', 'net', 'disk'])
+        self.assertEqual(f.source, g.source)
+        # node classes resolved by several threads at once are one kind, whichever thread got there first
+        for group_styles in (False, True):
+            sources = {self.build(['net', 'disk', 'cpu'], group_styles)[0].source for _ in range(3)}
+            self.assertEqual(len(sources), 1)
+        self.assertEqual(len(g._kinds), 2)
+
+        # edges between buffers, and handles from before the merge
+        with f.buffer('late'):
+            handles['net'].edge(handles['disk'])
+        self.assertLess(handles['cpu'].index, 0)
+        self.assertEqual(f.successors(handles['net']), [handles['disk']])
+        self.assertEqual(f.get_node(handles['cpu'].index), handles['cpu'])
+        handles['cpu'].edge(f.end('End'))
+
+        dot = pydot.graph_from_dot_data(f.source)[0]
+        self.assertEqual(len(dot.get_nodes()), 155)
+        self.assertEqual(len(dot.get_edges()), 155)
+        self.assertEqual(f.stats()['nodes'], 155)
+
+    def test_merge_while_running(self):
+        f = FlowgistonChart()
+        start = f.start('Start')
+        names = ['w%d' % i for i in range(4)]
+        barrier = threading.Barrier(len(names) + 1)
+        handles = {}
+
+        def worker(name):
+            with f.buffer(name):
+                barrier.wait()
+                prev = start
+                for i in range(2000):
+                    prev = prev.edge(f.process('%s %d' % (name, i)))
+                    # an edge into another thread's buffer, once it has a node to point at
+                    other = handles.get(names[(names.index(name) + 1) % len(names)])
+                    if other is not None and i % 100 == 0:
+                        prev.edge(other)
+                    handles[name] = prev
+
+        threads = [threading.Thread(target=worker, args=(name,)) for name in names]
+        # switch threads often, so merges land in the middle of adding nodes and edges
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            # merge repeatedly while the workers are writing
+            while any(thread.is_alive() for thread in threads):
+                f.stats()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        stats = f.stats()
+        self.assertEqual(stats['nodes'], 1 + 4 * 2000)
+        self.assertEqual(len(set(f._node_names)), stats['nodes'])
+        self.assertTrue(all(0 <= i < stats['nodes'] for i in f._edge_tails + f._edge_heads))
+        for name in names:
+            self.assertEqual(f.get_node(handles[name].index).label, '%s 1999' % name)
+
+    def test_merge_interleaving(self):
+        # the buffer's owner writes at the worst moments of a merge: while it counts and while it trims the columns
+        f = FlowgistonChart()
+        f.process('first')
+        with f.buffer('a') as buffer:
+            a = f.process('a')
+        kind = f.Generic
+        style = {'shape': 'box'}
+        writes = []
+
+        # (operation, write) pairs: the write runs straight after the merge's next such operation on the column
+        class Column(array):
+            def __len__(self):
+                length = super().__len__()
+                if writes and writes[-1][0] == 'len':
+                    writes.pop()[1]()
+                return length
+
+            def __delitem__(self, key):
+                super().__delitem__(key)
+                if writes and writes[-1][0] == 'del':
+                    writes.pop()[1]()
+
+        def add():
+            node = buffer.add_node(buffer.new_name(kind, 'b'), 'b', style, kind)
+            buffer.add_edge(a.index, node, None, {})
+            added.append(node)
+
+        added = []
+        buffer.node_styles = Column('l', buffer.node_styles)
+        writes.append(('len', add))
+        f._merge_buffers()
+        # a node added while the merge counted, and the edge to it, are merged together the next time
+        self.assertEqual(f.stats()['edges'], 1)
+        self.assertEqual(f.get_node(added[0]).label, 'b')
+
+        buffer.node_styles = Column('l', buffer.node_styles)
+        buffer.add_node(buffer.new_name(kind, 'c'), 'c', style, kind)
+        writes.append(('del', add))
+        f._merge_buffers()
+        f._merge_buffers()
+        self.assertEqual(len(set(added)), 2)
+        self.assertEqual(len(set(f._node_names)), len(f._node_names))
+        self.assertEqual([f.get_node(i).label for i in range(len(f._node_names))], ['first', 'a', 'b', 'c', 'b'])
+
+    def test_misuse(self):
+        f = FlowgistonChart()
+        with f.buffer('a'):
+            with self.assertRaises(RuntimeError):
+                f.add_nodes(['x'])
+            error = []
+
+            def other():
+                try:
+                    with f.buffer('a'):
+                        pass
+                except RuntimeError as e:
+                    error.append(e)
+
+            thread = threading.Thread(target=other)
+            thread.start()
+            thread.join()
+            self.assertEqual(len(error), 1)
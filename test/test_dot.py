@@ -0,0 +1,68 @@
+from unittest import TestCase
+from flowgiston import *
+from tempfile import TemporaryDirectory
+import os
+
+
+class TestLoad(TestCase):
+    def build(self):
+        Base = flowgiston_base(fontname='Helvetica')
+
+        class Stop(Base):
+            fillcolor = 'red'
+
+        class Warning(Base):
+            fillcolor = 'yellow'
+            shape = 'box'
+
+        f = FlowgistonChart(Base)
+        f.graph.attr(rankdir='LR')
+        f.graph.comment = 'Archived'
+        start = f.start('Start')
+        check = start.edge(f.if_('Quoted "label"\nover two lines'))
+        check.yes(f.Stop.node('Halt'), color='blue')
+        check.no(f.Warning.process('Warn <now>'))
+
+        retry = SubflowTemplate(Base, name='Retry')
+        retry.entry = retry.process('Try')
+        retry.entry.edge(retry.Stop.node('Give up'))
+        f.stamp(retry, cluster=True)
+        return Base, f
+
+    def test_round_trip(self):
+        Base, f = self.build()
+        with TemporaryDirectory() as td:
+            for group_styles in (False, True):
+                for compress in (False, True):
+                    f.group_styles = group_styles
+                    path = f.save('test.gv', td, compress=compress)
+                    g = FlowgistonChart.load(path, Base, group_styles=group_styles)
+                    self.assertEqual(g.source, f.source)
+                    # grouped files list nodes by class, so compare kinds by node name
+                    kinds = [{name: type(chart._kinds[k]).__name__ for name, k in zip(chart._node_names,
+                                                                                     chart._node_kinds)}
+                             for chart in (f, g)]
+                    self.assertEqual(kinds[0], kinds[1])
+            self.assertIs(g.get_node(g._node_names.index('n2')).flowbase, g.Stop)
+
+            # a loaded chart can be added to and saved again
+            g.get_node(3).edge(g.end('End'))
+            self.assertEqual(len(set(g._node_names)), 7)
+            self.assertIn('cluster_0', g.source)
+
+            # new nodes don't take the names of loaded ones, even when those aren't numbered in order
+            sub = f.overview().expand('Stop')
+            g = FlowgistonChart.load(sub.save('sub.gv', td), Base)
+            self.assertEqual(g._node_names, ['n2', 'n5'])
+            g.process('new')
+            g.add_nodes(['more', 'more'])
+            self.assertEqual(len(set(g._node_names)), 5)
+
+    def test_unsupported(self):
+        with TemporaryDirectory() as td:
+            path = os.path.join(td, 'test.gv')
+            for source in ('graph {\n\ta -- b\n}\n', 'digraph {\n\ta -> {b c}\n}\n', 'digraph {\n\ta -> b\n'):
+                with open(path, 'w') as fd:
+                    fd.write(source)
+                with self.assertRaises(ValueError):
+                    FlowgistonChart.load(path)
@@ -1,6 +1,10 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 from flowgiston import *
+from helpers import fake_run
 from tempfile import TemporaryDirectory
+import graphviz
+import gzip
+import io
 import os
 import pydot
 
@@ -89,3 +93,301 @@ class TestFlowchart(TestCase):
                 self.assertEqual(attrs['fillcolor'], 'green')
                 self.assertIn('dotted', attrs['style'])
                 self.assertIn('filled', attrs['style'])
+
+    def test_node_store(self):
+        f = FlowgistonChart()
+        n1 = f.process("N1")
+        n2 = n1.yes(f.process("N2"))
+        n1.edge(f.if_("N3", fillcolor='blue'))
+
+        # nodes sharing a style share one interned style tuple
+        self.assertEqual(len(f._node_names), 3)
+        self.assertEqual(f._node_styles[n1.index], f._node_styles[n2.index])
+        self.assertEqual(len(f._edge_tails), 2)
+
+        # nothing is written into the Digraph body until the source is generated
+        self.assertEqual(f.graph.body, [])
+        g = pydot.graph_from_dot_data(f.source)[0]
+        self.assertEqual(g.get_node(n2.name)[0].get_attributes()['label'], n2.label)
+        self.assertEqual(len(g.get_edges()), 2)
+
+    def test_render_formats(self):
+        f = FlowgistonChart()
+        f.process("N1")
+        with TemporaryDirectory() as td, mock.patch('graphviz.backend.run') as run:
+            rendered = f.render('test.gv', td, format=['svg', 'png', 'pdf'])
+            filepath = os.path.join(td, 'test.gv')
+            self.assertEqual(rendered, [filepath + '.svg', filepath + '.png', filepath + '.pdf'])
+
+            # a single layout run writes every format
+            run.assert_called_once()
+            self.assertEqual(run.call_args[0][0], ['dot', '-Tsvg', '-Tpng', '-Tpdf', '-O', filepath])
+
+    def test_group_styles(self):
+        Base = flowgiston_base()
+
+        class Stop(Base):
+            fillcolor = 'red'
+            shape = 'octagon'
+
+        f = FlowgistonChart(Base, group_styles=True)
+        s1 = f.Stop.node("S1")
+        s2 = f.Stop.node("S2", fillcolor='pink')
+        s1.edge(s2)
+
+        g = pydot.graph_from_dot_data(f.source)[0]
+        stop_group = [sg for sg in g.get_subgraph_list() if sg.get_node(s1.name)][0]
+
+        # the class style is written once as node defaults, nodes only carry their overrides
+        defaults = stop_group.get_node('node')[0].get_attributes()
+        self.assertEqual(defaults, {'fillcolor': 'red', 'shape': 'octagon', 'style': 'filled'})
+        self.assertEqual(stop_group.get_node(s1.name)[0].get_attributes(), {'label': 'S1'})
+        self.assertEqual(stop_group.get_node(s2.name)[0].get_attributes(), {'label': 'S2', 'fillcolor': 'pink'})
+        self.assertEqual(len(g.get_edges()), 1)
+
+    def test_streaming_save(self):
+        f = FlowgistonChart()
+        for i in range(500):
+            f.process("N%d" % i)
+        source = f.source + '\n'
+
+        out = io.BytesIO()
+        f.write(out, chunk_size=256)
+        self.assertEqual(out.getvalue().decode('utf-8'), source)
+
+        with TemporaryDirectory() as td:
+            with open(f.save('test.gv', td), 'r') as tf:
+                self.assertEqual(tf.read(), source)
+            with gzip.open(f.save('test.gv.gz', td, compress=True), 'rt') as tf:
+                self.assertEqual(tf.read(), source)
+
+    def test_bulk(self):
+        Base = flowgiston_base()
+
+        class Stop(Base):
+            fillcolor = 'red'
+            label = 'STOP'
+
+        f = FlowgistonChart(Base)
+        first = f.process("First")
+        ids = f.add_nodes(["A", "B", None], kind='Stop', styles={'shape': 'octagon'})
+        self.assertEqual(list(ids), [1, 2, 3])
+        f.add_edges([first.index] * 3, ids, labels=['a', 'b', 'c'])
+        f.add_edges(ids[:2], ids[1:], styles=[{'color': 'red'}, {'color': 'blue'}])
+        with self.assertRaises(IndexError):
+            f.add_edges([0], [10])
+
+        g = pydot.graph_from_dot_data(f.source)[0]
+        stop = f.get_node(ids[2])
+        attrs = g.get_node(stop.name)[0].get_attributes()
+        self.assertEqual(attrs['label'], 'STOP')
+        self.assertEqual(attrs['fillcolor'], 'red')
+        self.assertEqual(attrs['shape'], 'octagon')
+        self.assertIs(stop.flowbase, f.Stop)
+
+        edges = g.get_edges()
+        self.assertEqual(len(edges), 5)
+        self.assertEqual(edges[4].get_attributes(), {'color': 'blue'})
+
+        # node handles from bulk nodes work with the regular API
+        stop.yes(first)
+        self.assertEqual(f._edge_labels[-1], 'Yes')
+
+    def test_naming(self):
+        def build(naming):
+            f = FlowgistonChart(naming=naming)
+            n1 = f.process("N1")
+            n1.edge(f.process("N2"))
+            n1.edge(f.process("N2"))
+            return f
+
+        # identical charts give identical output
+        self.assertEqual(build('counter').source, build('counter').source)
+        self.assertEqual(build('content').source, build('content').source)
+        self.assertNotEqual(build('uuid').source, build('uuid').source)
+        self.assertEqual(build('counter')._node_names, ['n0', 'n1', 'n2'])
+        self.assertEqual(len(set(build('content')._node_names)), 3)
+
+        # content names don't depend on what else is in the chart
+        f = FlowgistonChart(naming='content')
+        f.if_("Unrelated")
+        self.assertEqual(f.process("N1").name, build('content')._node_names[0])
+
+        with self.assertRaises(ValueError):
+            FlowgistonChart(naming='sequential')
+
+        # counter names continue past the names already in a chart, however its nodes got there
+        with TemporaryDirectory() as td:
+            path = os.path.join(td, 'loaded.gv')
+            with open(path, 'w') as fd:
+                fd.write('digraph {\n\tn3 [label=A]\n\tstart [label=B]\n\tn3 -> start\n}\n')
+            f = FlowgistonChart.load(path)
+        f.process('C')
+        f.add_nodes(['D', 'E'])
+        template = SubflowTemplate(name='T')
+        template.entry = template.process('F')
+        f.stamp(template)
+        self.assertEqual(f._node_names, ['n3', 'start', 'n4', 'n5', 'n6', 'n7'])
+
+    def test_pygraphviz_backend(self):
+        try:
+            backend = PygraphvizBackend()
+        except ImportError:
+            self.skipTest('pygraphviz is not installed')
+        Base = flowgiston_base()
+
+        class Stop(Base):
+            fillcolor = 'red'
+
+        f = FlowgistonChart(Base, backend=backend)
+        n1 = f.Stop.node("N1")
+        n1.edge(f.process("N2"), "go")
+        n1.edge(f.process("N2"), "go")
+        self.assertEqual(backend.agraph(f).number_of_edges(), 2)
+
+        svg = f._repr_svg_()
+        self.assertIn('N1', svg)
+        self.assertIn('fill="red"', svg)
+        with TemporaryDirectory() as td:
+            rendered = f.render('test.gv', td, format=['svg', 'png'])
+            self.assertEqual(rendered, [os.path.join(td, 'test.gv.svg'), os.path.join(td, 'test.gv.png')])
+            for path in rendered:
+                self.assertGreater(os.path.getsize(path), 0)
+
+    def test_lazy_classes(self):
+        Base = flowgiston_base(fontname='Helvetica')
+
+        class Warning(Base):
+            fillcolor = 'yellow'
+
+        class Critical(Warning):
+            fillcolor = 'red'
+
+        f = FlowgistonChart(Base)
+        self.assertNotIn('Warning', f.__dict__)
+
+        # nested subclasses resolve too, and each class computes its style once
+        c = f.Critical.node("C")
+        self.assertEqual(c.flowbase._base_style, {'fillcolor': 'red', 'fontname': 'Helvetica', 'style': 'filled'})
+        self.assertIs(f.Critical, c.flowbase)
+        self.assertIs(FlowgistonChart(Base).Critical._class_style(), Critical._class_style())
+        self.assertEqual(Warning._class_style()['fillcolor'], 'yellow')
+        with self.assertRaises(AttributeError):
+            f.Missing
+
+    def test_exports(self):
+        namespace = {}
+        exec('import array\nfrom flowgiston import *', namespace)
+        self.assertIs(namespace['Digraph'], graphviz.Digraph)
+        self.assertIsInstance(namespace['array'], type(os))
+        for name in ('io', 'os', 'threading', 'blake2b', 'base', 'spec'):
+            self.assertNotIn(name, namespace)
+
+    def test_incremental_display(self):
+        f = FlowgistonChart()
+        n1 = f.process("N1")
+        with mock.patch('graphviz.backend.pipe', return_value=b'<svg/>') as pipe:
+            self.assertTrue(f.dirty)
+            self.assertEqual(f._repr_svg_(), '<svg/>')
+            self.assertFalse(f.dirty)
+            f._repr_svg_()
+            self.assertEqual(pipe.call_count, 1)
+            n1.edge(f.process("N2"))
+            self.assertTrue(f.dirty)
+            f._repr_svg_()
+            f.graph.attr(rankdir='LR')
+            f._repr_svg_()
+            self.assertEqual(pipe.call_count, 3)
+            # so do the chart options that change the SVG
+            f.optimize_svg = True
+            f._repr_svg_()
+            f.group_styles = True
+            f._repr_svg_()
+            self.assertEqual(pipe.call_count, 5)
+
+        try:
+            f.backend = PygraphvizBackend()
+        except ImportError:
+            self.skipTest('pygraphviz is not installed')
+        f.graph.engine = 'neato'
+        prev = n1
+        for i in range(20):
+            prev = prev.edge(f.process("P%d" % i))
+        f._repr_svg_()
+        positions = dict(f._layout_positions)
+        self.assertEqual(len(positions), len(f._node_names))
+        prev.edge(f.process("New"))
+        self.assertIn('New', f._repr_svg_())
+        # pinned nodes keep their places, though neato may shift the whole picture
+        shifts = {tuple(round(float(new) - float(old), 2) for new, old in zip(f._layout_positions[name], pos))
+                  for name, pos in positions.items()}
+        self.assertEqual(len(shifts), 1)
+        self.assertIsNone(f._positions)
+
+    def test_seeded_display_keeps_filename(self):
+        f = FlowgistonChart()
+        f.process('a').edge(f.process('b'))
+        f.graph.engine = 'neato'
+        filename, directory = f.graph.filename, f.graph.directory
+        with mock.patch('graphviz.backend.run', side_effect=fake_run) as run:
+            f._repr_svg_()
+            self.assertEqual(run.call_count, 1)
+        self.assertEqual((f.graph.filename, f.graph.directory), (filename, directory))
+
+    def test_queries(self):
+        f = FlowgistonChart()
+        start = f.start('Start')
+        check = start.edge(f.if_('Ready?'))
+        work = check.yes(f.process('Work'))
+        self.assertEqual(f.dangling_conditionals(), [check])
+        self.assertEqual(f.find_cycles(), [])
+        wait = check.no(f.process('Wait'))
+        wait.edge(check)
+        orphan = f.process('Orphan')
+
+        self.assertEqual(f.dangling_conditionals(), [])
+        self.assertEqual(f.successors(check), [work, wait])
+        self.assertEqual(f.successors(check, 'No'), [wait])
+        self.assertEqual(f.predecessors(check.index), [start, wait])
+        self.assertEqual(f.reachable_from(start), [start, check, work, wait])
+        self.assertEqual(f.unreachable_from(start), [orphan])
+        self.assertEqual(f.find_cycles(), [[check, wait]])
+
+        orphan.edge(orphan)
+        ids = f.add_nodes(['Loop %d' % i for i in range(1000)])
+        f.add_edges(ids, list(ids[1:]) + [ids[0]])
+        self.assertEqual([len(c) for c in f.find_cycles()], [2, 1, 1000])
+
+    def test_edge_helpers(self):
+        f = FlowgistonChart(unique_edges=True)
+        hub = f.process('Hub')
+        steps = [f.process('Step %d' % i) for i in range(5)]
+        self.assertEqual(hub.edges_to(steps, labels=['a', 'b', 'c', 'd', 'e'], color='red'), steps)
+        self.assertIs(f.fan_in(steps, hub), hub)
+        self.assertIs(f.chain(steps, 'then'), steps[-1])
+        self.assertEqual(f.stats()['edges'], 14)
+        self.assertEqual(f.successors(hub, 'c'), [steps[2]])
+        self.assertEqual(f.successors(steps[0]), [hub, steps[1]])
+
+        # repeats are dropped, whichever way they're added
+        hub.edge(steps[0], 'a')
+        f.fan_in(steps + steps, hub)
+        f.add_edges([0, 0], [1, 1], ['new', 'new'])
+        self.assertEqual(f.stats()['edges'], 15)
+        # the same ends with another label is a different edge
+        hub.edge(steps[0], 'x')
+        self.assertEqual(f.stats()['edges'], 16)
+        self.assertEqual(f.source.count('color=red'), 5)
+
+        f = FlowgistonChart()
+        a, b = f.process('a'), f.process('b')
+        a.edges_to([b, b])
+        self.assertEqual(f.stats()['edges'], 2)
+
+        # nodes of another chart can't be wired in
+        other = FlowgistonChart()
+        stranger = other.process('b0')
+        for connect in (lambda: b.edge(stranger), lambda: f.edge(stranger, a, 'x'), lambda: a.edges_to([stranger]),
+                        lambda: f.fan_in([stranger], a), lambda: f.chain([a, stranger])):
+            self.assertRaises(ValueError, connect)
+        self.assertEqual(f.stats()['edges'], 2)
@@ -0,0 +1,55 @@
+from unittest import TestCase, mock
+from flowgiston import *
+from tempfile import TemporaryDirectory
+import subprocess
+
+
+class TestInstrumentation(TestCase):
+    def test_stats(self):
+        events = []
+        instrumentation = Instrumentation()
+        instrumentation.add_hook(lambda event, seconds, data: events.append((event, data)))
+
+        f = FlowgistonChart(instrumentation=instrumentation, cache=RenderCache())
+        n1 = f.process("N1")
+        n1.edge(f.process("Größe"))
+        f.add_edges([0], [1])
+        source = f.source
+        size = len(source.encode('utf-8')) + 1
+        self.assertGreater(size, len(source) + 1)
+
+        with TemporaryDirectory() as td:
+            path = f.save('test.gv', td)
+            with mock.patch('graphviz.backend.pipe', return_value=b'<svg/>'):
+                f.pipe(format='svg')
+                f.pipe(format='svg')
+            error = subprocess.CalledProcessError(3, ['dot'])
+            with mock.patch('graphviz.backend.run', side_effect=error):
+                with self.assertRaises(subprocess.CalledProcessError):
+                    f.render('test.gv', td, format='png')
+
+        stats = f.stats()
+        self.assertEqual((stats['nodes'], stats['edges']), (2, 2))
+        counters = stats['counters']
+        self.assertEqual(counters['nodegen'], 2)
+        self.assertEqual(counters['edge'], 1)
+        self.assertEqual(counters['add_edges_count'], 1)
+        # render saves the chart again
+        self.assertEqual(counters['save'], 2)
+        self.assertEqual(counters['save_bytes'], 2 * size)
+        self.assertEqual(counters['pipe'], 1)
+        self.assertEqual(counters['cache_hit'], 1)
+        self.assertEqual(counters['render_errors'], 1)
+        self.assertIn('nodegen', stats['timings'])
+        self.assertEqual(stats['cache']['hits'], 1)
+
+        # per-node events are only aggregated, coarse ones reach the hooks
+        names = [event for event, _ in events]
+        self.assertNotIn('nodegen', names)
+        self.assertIn(('save', {'path': path, 'bytes': size, 'status': 0}), events)
+        self.assertEqual(events[-1], ('render', {'formats': ['png'], 'status': 3}))
+
+    def test_disabled(self):
+        f = FlowgistonChart()
+        f.process("N1")
+        self.assertEqual(f.stats(), {'nodes': 1, 'edges': 0, 'styles': 1})
@@ -0,0 +1,81 @@
+from unittest import TestCase, mock
+from flowgiston import *
+from helpers import fake_run
+from tempfile import TemporaryDirectory
+import os
+
+
+class TestOverview(TestCase):
+    def setUp(self):
+        Base = flowgiston_base()
+
+        class Check(Base):
+            shape = 'diamond'
+
+        class Step(Base):
+            pass
+
+        self.chart = f = FlowgistonChart(Base)
+        start = f.start('Start')
+        checks = [f.Check.node('check %d' % i) for i in range(3)]
+        steps = [f.Step.node('step %d' % i) for i in range(4)]
+        end = f.end('End')
+        start.edge(checks[0])
+        for check, step in zip(checks, steps):
+            check.yes(step)
+            check.no(steps[3])
+        checks[0].edge(checks[1])
+        steps[0].edge(end)
+        steps[1].edge(end)
+
+    def test_collapsed(self):
+        overview = self.chart.overview()
+        self.assertEqual(sorted(overview.groups), ['Check', 'Step'])
+        collapsed = overview.collapsed('svg')
+        self.assertEqual(collapsed.stats()['nodes'], 4)
+        source = collapsed.source
+        self.assertIn('label="Check\n3 nodes"', source)
+        self.assertIn('href="group0.gv.svg"', source)
+        self.assertIn('shape=box3d', source)
+        # the Yes and No edges from the checks to the steps are merged, the check -> check edge is dropped
+        self.assertIn('group_0 -> group_1 [label="6 edges"]', source)
+        self.assertIn('group_1 -> n8 [label="2 edges"]', source)
+        self.assertEqual(source.count('->'), 3)
+
+        sub = overview.expand('Check')
+        self.assertEqual(sub.stats()['nodes'], 3)
+        self.assertEqual(sub.stats()['edges'], 1)
+        self.assertRaises(KeyError, overview.expand, 'Start')
+
+    def test_expanded_names(self):
+        sub = self.chart.overview().expand('Step')
+        self.assertEqual(sub._node_names, ['n4', 'n5', 'n6', 'n7'])
+        sub.process('new')
+        sub.add_nodes(['more', 'more'])
+        self.assertEqual(len(set(sub._node_names)), 7)
+
+        # the source chart's options are kept, and content names carry on from it
+        f = FlowgistonChart(self.chart.flowgiston_base_klass, naming='content', unique_edges=True, optimize_svg=True)
+        f.Step.node('step').edge(f.Step.node('step'))
+        sub = f.overview().expand('Step')
+        self.assertEqual((sub.naming, sub.unique_edges, sub.optimize_svg), ('content', True, True))
+        sub.Step.node('step')
+        self.assertEqual(len(set(sub._node_names)), 3)
+
+    def test_components(self):
+        f = FlowgistonChart()
+        for chain in range(3):
+            nodes = [f.process('%d.%d' % (chain, i)) for i in range(chain + 1)]
+            for a, b in zip(nodes, nodes[1:]):
+                a.edge(b)
+        overview = f.overview('components')
+        self.assertEqual({key: len(members) for key, members in overview.groups.items()}, {1: 2, 2: 3})
+        self.assertEqual(overview.collapsed().stats()['nodes'], 3)
+
+    def test_render(self):
+        overview = self.chart.overview(lambda node: 'steps' if node.label.startswith('step') else None)
+        with TemporaryDirectory() as td, mock.patch('graphviz.backend.run', side_effect=fake_run):
+            path, paths = overview.render(td, max_workers=2)
+            self.assertEqual(path, os.path.join(td, 'overview.gv.svg'))
+            self.assertEqual(paths, {'steps': os.path.join(td, 'group0.gv.svg')})
+            self.assertTrue(os.path.exists(paths['steps']))
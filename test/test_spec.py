@@ -0,0 +1,88 @@
+from unittest import TestCase, mock
+from flowgiston import *
+from helpers import fake_run
+from flowgiston.cli import main
+from tempfile import TemporaryDirectory
+import json
+import os
+
+SPEC = {
+    'graph': {'graph_attr': {'rankdir': 'LR'}},
+    'kinds': {'Alert': {'fillcolor': 'red'}},
+    'nodes': [
+        {'id': 'start', 'type': 'start', 'next': 'check'},
+        {'id': 'check', 'type': 'conditional', 'label': 'Over limit?', 'yes': 'alert', 'no': 'end'},
+        {'id': 'alert', 'kind': 'Alert', 'label': 'Page on-call', 'penwidth': 2},
+        {'id': 'end', 'type': 'end'},
+    ],
+    'edges': [{'from': 'alert', 'to': 'end', 'style': 'dashed'}, ['end', 'start', 'again']],
+}
+
+
+class TestSpec(TestCase):
+    def test_compile(self):
+        f = compile_spec(SPEC)
+        self.assertEqual(f.stats()['nodes'], 4)
+        self.assertEqual(f.stats()['edges'], 5)
+        self.assertEqual(f.graph.graph_attr['rankdir'], 'LR')
+        start, check, alert, end = map(f.get_node, range(4))
+        self.assertEqual(start.label, 'Start')
+        self.assertEqual(f.successors(check, 'Yes'), [alert])
+        self.assertEqual(f.successors(check, 'No'), [end])
+        self.assertEqual(type(alert.flowbase).__name__, 'Alert')
+        source = f.source
+        self.assertIn('fillcolor=red', source)
+        self.assertIn('penwidth=2', source)
+        self.assertIn('style=dashed', source)
+        self.assertIn('[label=again]', source)
+
+    def test_kinds_stay_local(self):
+        Base = flowgiston_base()
+
+        class Alert(Base):
+            shape = 'box'
+
+        f = compile_spec(dict(SPEC, kinds={'Alert': {'fillcolor': 'red'}, 'Escalate': {'color': 'blue'}},
+                              nodes=SPEC['nodes'] + [{'id': 'up', 'kind': 'Escalate'}]), Base)
+        alert = f.get_node(2)
+        self.assertEqual(type(alert.flowbase).__name__, 'Alert')
+        self.assertIn('shape=box', f.source)
+        self.assertIn('color=blue', f.source)
+        self.assertNotIn('Escalate', [klass.__name__ for klass in Base.__subclasses__()])
+        self.assertRaises(AttributeError, getattr, FlowgistonChart(Base), 'Escalate')
+        self.assertIs(type(FlowgistonChart(Base).Alert), Alert)
+
+    def test_errors(self):
+        self.assertRaises(ValueError, compile_spec, {'nodes': [{'id': 'a', 'kind': 'Missing'}]})
+        self.assertRaises(ValueError, compile_spec, {'nodes': [{'id': 'a'}], 'edges': [['a', 'b']]})
+        self.assertRaises(ValueError, compile_spec, {'nodes': [{'id': 'a'}, {'id': 'a'}]})
+
+    def test_json_lines(self):
+        with TemporaryDirectory() as td:
+            path = os.path.join(td, 'spec.jsonl')
+            with open(path, 'w') as fd:
+                fd.write(json.dumps({'kinds': SPEC['kinds']}) + '\n')
+                for record in SPEC['nodes'] + SPEC['edges']:
+                    fd.write(json.dumps(record) + '\n')
+            self.assertEqual(load_spec(path).source, compile_spec(dict(SPEC, graph=None)).source)
+
+    def test_cli(self):
+        with TemporaryDirectory() as td, mock.patch('graphviz.backend.run', side_effect=fake_run) as run:
+            for name in ('a', 'b'):
+                with open(os.path.join(td, name + '.json'), 'w') as fd:
+                    json.dump(SPEC, fd)
+            with open(os.path.join(td, 'bad.json'), 'w') as fd:
+                json.dump({'nodes': [{'id': 'a'}], 'edges': [['a', 'b']]}, fd)
+            out = os.path.join(td, 'out')
+
+            with mock.patch('sys.stdout'), mock.patch('sys.stderr'):
+                self.assertEqual(main([td, '-o', out, '-j', '2']), 1)
+            self.assertEqual(run.call_count, 2)
+            self.assertTrue(os.path.exists(os.path.join(out, 'a.gv.svg')))
+
+            # only specs changed since their output was rendered are rendered again
+            results = list(compile_specs([td], directory=out))
+            self.assertEqual(run.call_count, 2)
+            self.assertEqual(sorted((os.path.basename(r.spec), r.skipped) for r in results),
+                             [('a.json', True), ('b.json', True), ('bad.json', False)])
+            self.assertIsInstance([r for r in results if not r.skipped][0].error, ValueError)
@@ -0,0 +1,106 @@
+from unittest import TestCase, mock
+from flowgiston import *
+from flowgiston import svg
+from tempfile import TemporaryDirectory
+import asyncio
+import gzip
+
+# Graphviz output for a chart with an Alert node, a Generic node and an edge between them
+SVG = b'''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"
+ "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">
+<!-- Generated by graphviz version 2.43.0 (0)
+ -->
+<!-- Title: %3 Pages: 1 -->
+<svg width="89pt" height="116pt"
+ viewBox="0.00 0.00 89.00 116.00" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">
+<g id="graph0" class="graph" transform="scale(1 1) rotate(0) translate(4 112)">
+<title>%3</title>
+<polygon fill="white" stroke="transparent" points="-4,4 -4,-112 85,-112 85,4 -4,4"/>
+<!-- n0 -->
+<g id="node1" class="node">
+<title>n0</title>
+<polygon fill="red" stroke="black" points="81,-108 0,-108 0,-72 81,-72 81,-108"/>
+<text text-anchor="middle" x="40.5" y="-86.3" font-family="Times,serif" font-size="14.00">Page on&#45;call</text>
+</g>
+<!-- n1 -->
+<g id="node2" class="node">
+<title>n1</title>
+<g id="a_node2"><a xlink:href="more.svg" xlink:title="Done">
+<ellipse fill="#d3d3d3" stroke="#1f77b4" cx="40.5" cy="-18" rx="27" ry="18"/>
+<text text-anchor="middle" x="40.5" y="-14.3" font-family="Times,serif" font-size="14.00">Done</text>
+</a>
+</g>
+</g>
+<!-- n0&#45;&gt;n1 -->
+<g id="edge1" class="edge">
+<title>n0&#45;&gt;n1</title>
+<path fill="none" stroke="black" d="M40.5,-71.7C40.5,-63.98 40.5,-54.71 40.5,-46.11"/>
+<polygon fill="black" stroke="black" points="44,-46.1 40.5,-36.1 37,-46.1 44,-46.1"/>
+</g>
+</g>
+</svg>
+'''
+
+
+class SvgBackend(RenderBackend):
+    def pipe(self, chart, format, renderer=None, formatter=None, data=None):
+        return SVG
+
+    def render(self, chart, filepath, formats, renderer=None, formatter=None):
+        with open(filepath + '.svg', 'wb') as fd:
+            fd.write(SVG)
+        return [filepath + '.svg']
+
+
+class TestSvg(TestCase):
+    def test_optimize(self):
+        out = svg.optimize(SVG, {'n0': 'Alert', 'n1': 'Generic'}).decode('utf-8')
+        self.assertLess(len(out), len(SVG))
+        for gone in ('<!--', '<title>', 'DOCTYPE', 'font-family="', 'node1', '\n'):
+            self.assertNotIn(gone, out)
+        self.assertIn('<g id="n1" class="node Alert">', out)
+        self.assertIn('<polygon points="81,-108 0,-108 0,-72 81,-72 81,-108" class="Alert-polygon"/>', out)
+        self.assertIn('.Alert-polygon{fill:red;stroke:black}', out)
+        self.assertIn('.Alert-text{text-anchor:middle;font-family:Times,serif;font-size:14.00px}', out)
+        # the shapes inside a node's link are styled with the node
+        self.assertIn('class="Generic-ellipse"', out)
+        # hex colours aren't id references
+        self.assertIn('.Generic-ellipse{fill:#d3d3d3;stroke:#1f77b4}', out)
+        self.assertIn('xlink:href="more.svg"', out)
+        self.assertIn('>Page on&#45;call</text>', out)
+        # edges with the same style share a class
+        self.assertEqual(out.count('class="edge-polygon"'), 1)
+        self.assertIn('.edge-path{fill:none;stroke:black}', out)
+
+        # class names are made valid CSS identifiers
+        odd = svg.optimize(SVG, {'n0': 'On Call', 'n1': '2fa.b'}).decode('utf-8')
+        self.assertIn('<g id="n1" class="node On_Call">', odd)
+        self.assertIn('.On_Call-polygon{fill:red;stroke:black}', odd)
+        self.assertIn('._2fa_b-ellipse{fill:#d3d3d3;stroke:#1f77b4}', odd)
+
+        kept = svg.optimize(SVG, keep_ids=True).decode('utf-8')
+        self.assertIn('<g id="node1" class="node">', kept)
+        self.assertIn('class="node-polygon"', kept)
+
+    def test_chart(self):
+        Base = flowgiston_base()
+
+        class Alert(Base):
+            fillcolor = 'red'
+
+        f = FlowgistonChart(Base, optimize_svg=True)
+        f.Alert.node('Page on-call').edge(f.end('Done'))
+        with mock.patch('graphviz.backend.pipe', return_value=SVG):
+            self.assertIn(b'class="node Alert"', f.optimized_svg())
+            self.assertEqual(gzip.decompress(f.optimized_svg(compress=True)), f.optimized_svg())
+            self.assertIn('.Generic-ellipse{', f._repr_svg_())
+
+        # the sync and async renders give the same, optimized SVG
+        f.backend = SvgBackend()
+        with TemporaryDirectory() as td:
+            with open(f.render('sync.gv', td, format='svg'), 'rb') as fd:
+                rendered = fd.read()
+            with open(asyncio.run(f.render_async('async.gv', td, format='svg')), 'rb') as fd:
+                self.assertEqual(fd.read(), rendered)
+        self.assertEqual(rendered, f.optimized_svg())
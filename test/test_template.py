@@ -0,0 +1,48 @@
+from unittest import TestCase
+from flowgiston import *
+import pydot
+
+
+class TestTemplate(TestCase):
+    def build(self):
+        Base = flowgiston_base()
+
+        class Alert(Base):
+            fillcolor = 'red'
+
+        retry = SubflowTemplate(Base, name='Retry')
+        check = retry.if_('Sensor OK?')
+        retry.entry = check
+        retry.exits['ok'] = check.yes(retry.process('Continue'))
+        retry.exits['escalate'] = check.no(retry.Alert.node('Escalate'))
+        return Base, retry
+
+    def test_stamp(self):
+        Base, retry = self.build()
+        chart = FlowgistonChart(Base)
+        start = chart.start('Start')
+        first = chart.stamp(retry)
+        second = chart.stamp(retry, cluster=True, label='Second try')
+        start.edge(first.entry)
+        first.exits['escalate'].edge(second.entry)
+
+        self.assertEqual(list(first.nodes), [1, 2, 3])
+        self.assertEqual(list(second.nodes), [4, 5, 6])
+        self.assertEqual(second.exits['escalate'].label, 'Escalate')
+        self.assertIs(second.exits['escalate'].flowbase, chart.Alert)
+
+        g = pydot.graph_from_dot_data(chart.source)[0]
+        self.assertEqual(len(g.get_edges()), 6)
+        attrs = g.get_node(second.exits['escalate'].name)[0].get_attributes()
+        self.assertEqual(attrs['fillcolor'], 'red')
+        cluster = g.get_subgraph('cluster_0')[0]
+        self.assertEqual(cluster.get_attributes()['label'], '"Second try"')
+        self.assertEqual(sorted(n.get_name() for n in cluster.get_nodes()),
+                         sorted(chart.get_node(i).name for i in second.nodes))
+
+    def test_names(self):
+        Base, retry = self.build()
+        chart = FlowgistonChart(Base, naming='content')
+        names = [chart.stamp(retry).entry.name for _ in range(3)]
+        self.assertEqual(len(set(names)), 3)
+        self.assertEqual(len(set(chart._node_names)), 9)